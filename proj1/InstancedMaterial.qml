@@ -0,0 +1,38 @@
+import Qt3D.Core 2.0
+import Qt3D.Render 2.0
+
+// material for instanced meshes, each instance positioned by its instanceModel attribute
+
+Material {
+    parameters: [
+        Parameter { name: "color"; value: Qt.vector3d(0.5, 0.5, 0.5) },
+        Parameter { name: "lightDirection"; value: Qt.vector3d(1.0, -1.0, 1.0) }
+    ]
+    effect: Effect {
+        techniques: [
+            Technique {
+                filterKeys: [
+                    FilterKey {
+                        id: forward
+                        name: "renderingStyle"
+                        value: "forward"
+                    }
+                ]
+                // only works in OpenGL 3.3
+                graphicsApiFilter {
+                    api: GraphicsApiFilter.OpenGL
+                    profile: GraphicsApiFilter.CoreProfile
+                    majorVersion: 3
+                    minorVersion: 3
+                }
+                renderPasses: RenderPass {
+                    shaderProgram: ShaderProgram {
+                        // use custom shaders
+                        vertexShaderCode: loadSource("file:proj1/instanced.vert")
+                        fragmentShaderCode: loadSource("file:proj1/instanced.frag")
+                    }
+                }
+            }
+        ]
+    }
+}
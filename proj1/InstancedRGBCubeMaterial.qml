@@ -0,0 +1,34 @@
+import Qt3D.Core 2.0
+import Qt3D.Render 2.0
+
+// material for instanced RGB cubes, each instance positioned by its instanceModel attribute
+
+Material {
+    effect: Effect {
+        techniques: [
+            Technique {
+                filterKeys: [
+                    FilterKey {
+                        id: forward
+                        name: "renderingStyle"
+                        value: "forward"
+                    }
+                ]
+                // only works in OpenGL 3.3
+                graphicsApiFilter {
+                    api: GraphicsApiFilter.OpenGL
+                    profile: GraphicsApiFilter.CoreProfile
+                    majorVersion: 3
+                    minorVersion: 3
+                }
+                renderPasses: RenderPass {
+                    shaderProgram: ShaderProgram {
+                        // use custom shaders, same fragment shader as a single RGB cube
+                        vertexShaderCode: loadSource("file:proj1/instanced_rgb_cube.vert")
+                        fragmentShaderCode: loadSource("file:proj1/rgb_cube.frag")
+                    }
+                }
+            }
+        ]
+    }
+}
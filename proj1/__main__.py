@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import sys
 import math
+import shutil
 import itertools
 
-from PyQt5.QtGui import QVector3D, QMatrix4x4
+import numpy as np
+from PyQt5.QtGui import QVector3D
 from PyQt5.QtWidgets import QApplication
 
 from .animation import Animation
-from .quaternion import Quaternion
 from .spline import read_spec as read_spline_spec
 from .spline import CatmullRomSpline, UniformBSpline
+from .recording import TransformRecorder, TransformRecording, spec_digest
+from .keyframes import reduce_rotation_keys
+from .easing import EASINGS, parse_time_warp
+from .instancing import pack_instance_matrices, TransformSink, SplineFollower
+from .streaming import TransformPublisher
 from . import util
 
 
@@ -20,31 +27,38 @@ class Proj1Ani(Animation):
     Implements the spline animation.
     """
 
-    def __init__(self, spline_spec_path):
+    def __init__(self, spline_spec_path, record_path=None, rotation_tolerance=None, easing=None, publisher=None):
         # read in splines and get list of them and rotations
         self.splines, self.rotations = read_spline_spec(spline_spec_path)
+        if easing is not None:
+            # override the time warp of every spline
+            time_warp = parse_time_warp(easing)
+            for spline in self.splines:
+                spline.time_warp = time_warp
+        # rotations are evenly spaced over the spline parameter
+        self.rotation_times = [util.lerp(i, 0, len(self.rotations) - 1, 0, 1) for i in range(len(self.rotations))]
+        if rotation_tolerance is not None:
+            # drop rotations that can be slerped from their neighbours
+            num_rotations = len(self.rotations)
+            self.rotation_times, self.rotations, max_error = reduce_rotation_keys(self.rotations, rotation_tolerance, self.rotation_times)
+            print('Reduced rotation keys from {} to {} (max error {:.4g} radians)'.format(num_rotations, len(self.rotations), max_error))
         # total animation time is sum of each spline's animation time
         total_time = sum(spline.ani_time for spline in self.splines)
 
         super().__init__('CS 4732 Project 1 by Daniel Beckwith', 60.0, total_time)
 
-        # determine extent of spline ctrl points for positioning camera
-        spline_min = QVector3D(float('+inf'), float('+inf'), float('+inf'))
-        spline_max = QVector3D(float('-inf'), float('-inf'), float('-inf'))
-        for spline in self.splines:
-            for p in spline.ctrl_pts:
-                if p.x() < spline_min.x():
-                    spline_min.setX(p.x())
-                if p.x() > spline_max.x():
-                    spline_max.setX(p.x())
-                if p.y() < spline_min.y():
-                    spline_min.setY(p.y())
-                if p.y() > spline_max.y():
-                    spline_max.setY(p.y())
-                if p.z() < spline_min.z():
-                    spline_min.setZ(p.z())
-                if p.z() > spline_max.z():
-                    spline_max.setZ(p.z())
+        # optionally stream the cube's transform on each frame to other processes
+        self.publisher = publisher
+
+        # optionally record the cube's transform on each frame
+        self.recorder = None
+        if record_path is not None:
+            self.recorder = TransformRecorder(record_path, self.frame_rate, spec_digest(spline_spec_path))
+
+        # determine extent of splines for positioning camera from their cached bounding boxes
+        bounds = np.array([spline.bounds for spline in self.splines])
+        spline_min = QVector3D(*bounds[:, 0].min(axis=0))
+        spline_max = QVector3D(*bounds[:, 1].max(axis=0))
         spline_center = (spline_min + spline_max) / 2
         spline_extent = (spline_max - spline_min).length()
 
@@ -54,11 +68,11 @@ class Proj1Ani(Animation):
             camera_position=spline_center + QVector3D(0.0, 0.0, -2.5 * spline_extent),
             camera_lookat=spline_center)
 
-        # add a sphere marking each ctrl point of each spline
-        for spline in self.splines:
-            for p in spline.ctrl_pts:
-                xform = self.add_sphere(0.2)
-                xform.setTranslation(p)
+        # add a sphere marking each ctrl point of each spline, all drawn at once
+        ctrl_pts = [(p.x(), p.y(), p.z()) for spline in self.splines for p in spline.ctrl_pts]
+        markers = self.add_instanced_spheres(0.2, len(ctrl_pts))
+        pack_instance_matrices(ctrl_pts, out=markers.matrices)
+        markers.update()
 
         # iterator of the time when each spline animation ends
         self.spline_end_times = itertools.accumulate(spline.ani_time for spline in self.splines)
@@ -77,7 +91,9 @@ class Proj1Ani(Animation):
         Overriddes Animation.make_scene
         """
         # cube that will follow the splines
-        self.cube_transform = self.add_rgb_cube(1.0, 1.0, 1.0)
+        # drawn as a single instance so its transform can be written straight into the instance buffer
+        self.cube = self.add_instanced_rgb_cubes(1.0, 1.0, 1.0, 1)
+        self.cube_follower = SplineFollower(self.rotation_times, self.rotations, TransformSink(self.cube.matrices))
 
         # add some lights
         self.add_light(QVector3D(-20.0, 20.0, -20.0), 1.0) # upper right key light
@@ -99,17 +115,14 @@ class Proj1Ani(Animation):
 
             if self.spline_path is not None:
                 # if had a spline path from before, remove it from the scene
-                for p in self.spline_path:
-                    # setting the parent to null deletes the object
-                    p.setParent(None)
+                for chunk in self.spline_path.values():
+                    for p in chunk:
+                        # setting the parent to null deletes the object
+                        p.setParent(None)
 
             # create a path in the scene along the current spline
-            path_pts = []
-            num_path_pts = int(self.curr_spline.ani_time * self.frame_rate) # number of frames in the spline's animation
-            for i in range(num_path_pts):
-                t = util.lerp(i, 0, num_path_pts, 0, 1)
-                path_pts.append(self.curr_spline.pos_at(t))
-            self.spline_path = self.add_path(*path_pts)
+            self.spline_path = {}
+            self._cull_spline_path()
         except StopIteration:
             # reached the end of the splines iterator
             self.curr_spline = None
@@ -117,6 +130,40 @@ class Proj1Ani(Animation):
             self.curr_spline_end_time = None
             self.spline_path = None
 
+    def _cull_spline_path(self):
+        """
+        Brings the path along the current spline up to date with the camera's view. The path is made of one chunk
+        per spline segment, kept in self.spline_path by segment index, and only segments at least partly in view
+        have one, so chunks that came into view are added and ones that went out of it are removed.
+        """
+        num_path_pts = int(self.curr_spline.ani_time * self.frame_rate) # number of frames in the spline's animation
+        last_t = util.lerp(num_path_pts - 1, 0, num_path_pts, 0, 1)
+        camera = self.view.camera()
+        # distance at which chunks get one path point per frame
+        full_detail_distance = (camera.viewCenter() - camera.position()).length()
+        for i, ((t0, t1), segment_bounds) in enumerate(zip(self.curr_spline.segment_params, self.curr_spline.segment_bounds)):
+            if not self.box_in_view(segment_bounds):
+                if i in self.spline_path:
+                    for p in self.spline_path.pop(i):
+                        p.setParent(None)
+                continue
+            if i in self.spline_path:
+                continue
+            # fewer path points for chunks further away than the center of the view
+            segment_center = QVector3D(*((segment_bounds[0] + segment_bounds[1]) / 2))
+            detail = min(1.0, full_detail_distance / max((segment_center - camera.position()).length(), 1e-6))
+            num_chunk_pts = max(2, int(math.ceil((t1 - t0) * num_path_pts * detail)) + 1)
+            path_pts = [self.curr_spline.pos_at(min(t, last_t)) for t in np.linspace(t0, t1, num_chunk_pts)]
+            self.spline_path[i] = self.add_path(*path_pts)
+
+    def view_changed(self):
+        """
+        Overriddes Animation.view_changed
+        """
+        # the first path is made before the window has its final size, so it's culled again once it does
+        if self.curr_spline is not None:
+            self._cull_spline_path()
+
     def update(self, frame, t, dt):
         """
         Overriddes Animation.update
@@ -129,20 +176,78 @@ class Proj1Ani(Animation):
             # lerp spline parameter from animation time
             spline_t = util.lerp(t, self.curr_spline_start_time, self.curr_spline_end_time, 0, 1)
 
-            # get spline point
-            pos = self.curr_spline.pos_at(spline_t)
-            # slerp rotations
-            rot = Quaternion.slerp(spline_t, *self.rotations)
-
-            # build transformation matrix
-            # start with rotation matrix
-            xform = QMatrix4x4(rot.mat4x4)
-            # set translation cells
-            xform[0, 3] = pos.x()
-            xform[1, 3] = pos.y()
-            xform[2, 3] = pos.z()
-            # transform cube
-            self.cube_transform.setMatrix(xform)
+            # write transformation matrix of cube and upload it
+            self.cube_follower.update(self.curr_spline, spline_t)
+            self.cube.update()
+            x, y, z = self.cube_follower.pos
+            s, qx, qy, qz = self.cube_follower.rot
+
+            if self.recorder is not None:
+                self.recorder.write(x, y, z, s, qx, qy, qz)
+            if self.publisher is not None:
+                self.publisher.publish(frame, t, x, y, z, s, qx, qy, qz)
+
+    def finish(self):
+        """
+        Overriddes Animation.finish
+        """
+        if self.recorder is not None:
+            self.recorder.close()
+
+class ReplayAni(Animation):
+    """
+    Plays back a recording made by Proj1Ani without doing any spline calculations.
+    """
+
+    def __init__(self, recording_path, publisher=None):
+        self.publisher = publisher
+
+        # memory-map the recording, frames are read from it as needed
+        self.recording = TransformRecording(recording_path)
+        if not len(self.recording):
+            raise ValueError('{} has no frames'.format(recording_path))
+
+        super().__init__('CS 4732 Project 1 by Daniel Beckwith (replay)', self.recording.frame_rate, len(self.recording) / self.recording.frame_rate)
+
+        # determine extent of recorded positions for positioning camera
+        path_min, path_max = self.recording.bounds()
+        path_min = QVector3D(*path_min)
+        path_max = QVector3D(*path_max)
+        path_center = (path_min + path_max) / 2
+        path_extent = max((path_max - path_min).length(), 1.0)
+
+        self.setup_scene(
+            background_color=util.hsl(0, 0, 0),
+            camera_position=path_center + QVector3D(0.0, 0.0, -2.5 * path_extent),
+            camera_lookat=path_center)
+
+    def make_scene(self):
+        """
+        Overriddes Animation.make_scene
+        """
+        self.cube = self.add_instanced_rgb_cubes(1.0, 1.0, 1.0, 1)
+        self.cube_sink = TransformSink(self.cube.matrices)
+
+        self.add_light(QVector3D(-20.0, 20.0, -20.0), 1.0) # upper right key light
+        self.add_light(QVector3D(20.0, 10.0, -20.0), 0.5) # upper left fill light
+
+    def update(self, frame, t, dt):
+        """
+        Overriddes Animation.update
+        """
+        # seek straight to the frame, holding the last one if run past the end
+        record = self.recording[min(frame, len(self.recording) - 1)]
+        self.cube_sink.write(0, *record)
+        self.cube.update()
+
+        if self.publisher is not None:
+            self.publisher.publish(frame, t, *record)
+
+    def finish(self):
+        """
+        Overriddes Animation.finish
+        """
+        self.recording.close()
 
 if __name__ == '__main__':
     import argparse
@@ -150,12 +255,51 @@ if __name__ == '__main__':
         prog='proj1',
         description='Animates an object travelling along a spline.',
         epilog='Created by Daniel Beckwith for WPI CS 4732.')
-    parser.add_argument('spline_spec', help='Path to a text file containing the spline and rotation control points.')
+    parser.add_argument('spline_spec', nargs='?', help='Path to a text file containing the spline and rotation control points.')
+    parser.add_argument('--record', metavar='PATH', help='Record the transform of the object on each frame to a binary file.')
+    parser.add_argument('--rotation-tolerance', type=float, metavar='RADIANS', help='Remove rotation keys whose removal changes the orientation by at most this angle.')
+    parser.add_argument('--easing', metavar='CURVE', help='Time warp for the spline parameter of every spline, overriding the spline spec. Either one of {} or a comma-separated list of increasing values from 0 to 1, such as "0, 0.2, 0.7, 1".'.format(', '.join(sorted(EASINGS))))
+    parser.add_argument('--replay', metavar='PATH', help='Play back a file made with --record instead of animating a spline spec.')
+    parser.add_argument('--stream', metavar='ADDRESS', help='Stream the transform of the object on each frame to subscribers connecting to this HOST:PORT or Unix domain socket path.')
+    parser.add_argument('--capture', metavar='DIR', help='Render every frame offscreen and save them as PNG images in this directory instead of showing a window.')
+    parser.add_argument('--capture-size', metavar='WxH', default='1280x720', help='Size of the captured images (default: %(default)s).')
+    parser.add_argument('--capture-workers', type=int, default=4, metavar='N', help='Number of threads encoding captured images (default: %(default)s).')
     args = parser.parse_args()
+    if args.replay is None and args.spline_spec is None:
+        parser.error('a spline spec is required unless using --replay')
+    if args.capture is not None:
+        try:
+            capture_width, capture_height = map(int, args.capture_size.split('x'))
+        except ValueError:
+            parser.error('--capture-size must look like 1280x720')
+        if sys.platform.startswith('linux'):
+            if not os.environ.get('DISPLAY') and 'QT_QPA_PLATFORM' not in os.environ:
+                # Qt's offscreen platform still needs an X server for OpenGL, so start a virtual one if possible
+                if shutil.which('xvfb-run') is None:
+                    parser.error('--capture needs an X display for OpenGL, on a headless machine install Xvfb and run under xvfb-run -a')
+                os.execvp('xvfb-run', ['xvfb-run', '-a', '-s', '-screen 0 {}x{}x24'.format(capture_width, capture_height),
+                    sys.executable, '-m', 'proj1'] + sys.argv[1:])
+            # render without showing a window, using software OpenGL unless told otherwise
+            os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+            os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
 
     app = QApplication([])
 
-    ani = Proj1Ani(args.spline_spec)
-    ani.run()
+    publisher = TransformPublisher(args.stream) if args.stream is not None else None
+
+    if args.replay is not None:
+        ani = ReplayAni(args.replay, publisher=publisher)
+    else:
+        ani = Proj1Ani(args.spline_spec, record_path=args.record, rotation_tolerance=args.rotation_tolerance, easing=args.easing, publisher=publisher)
+    if args.capture is not None:
+        ani.capture(args.capture, capture_width, capture_height, args.capture_workers)
+    else:
+        ani.run()
 
-    sys.exit(app.exec_())
+    status = app.exec_()
+    ani.finish()
+    if publisher is not None:
+        dropped = publisher.close()
+        if dropped:
+            print('Dropped {} frames for subscribers that fell behind'.format(dropped))
+    sys.exit(status)
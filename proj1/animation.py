@@ -1,15 +1,64 @@
 # -*- coding: utf-8 -*-
 
+import os
 import os.path
+import time
+import collections
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 from PyQt5.QtCore import QTimer
 from PyQt5.QtGui import QVector3D, QQuaternion
 from PyQt5.Qt3DCore import QEntity, QTransform
-from PyQt5.Qt3DRender import QPointLight
+from PyQt5.Qt3DRender import QPointLight, QAttribute, QBuffer, QRenderCapture, QFrustumCulling
 from PyQt5.Qt3DExtras import Qt3DWindow, QCuboidMesh, QSphereMesh, QCylinderMesh, QPhongMaterial
 from PyQt5.QtQml import QQmlComponent, QQmlEngine
 
 from . import util
+from .instancing import INSTANCE_SIZE, InstanceBuffer
+from .culling import box_in_frustum
+
+
+class Instances(object):
+    """
+    Many copies of one mesh drawn in a single draw call, each placed by its own model matrix.
+    """
+
+    def __init__(self, mesh, count):
+        """
+        Makes a mesh instanced. All instances start at the origin.
+
+        Arguments:
+            mesh: QGeometryRenderer, the mesh to draw count times
+            count: int, the number of instances
+        """
+        self.count = count
+        self.instance_buffer = InstanceBuffer(count)
+        # per-instance model matrices, see instancing.pack_instance_matrices
+        # fill this in place and call update to upload it
+        self.matrices = self.instance_buffer.matrices
+
+        self.buffer = QBuffer(QBuffer.VertexBuffer, mesh)
+        attribute = QAttribute(mesh)
+        attribute.setName('instanceModel')
+        attribute.setAttributeType(QAttribute.VertexAttribute)
+        attribute.setVertexBaseType(QAttribute.Float)
+        attribute.setVertexSize(INSTANCE_SIZE)
+        attribute.setByteStride(INSTANCE_SIZE * self.matrices.itemsize)
+        attribute.setCount(count)
+        # advance once per instance instead of once per vertex
+        attribute.setDivisor(1)
+        attribute.setBuffer(self.buffer)
+        mesh.geometry().addAttribute(attribute)
+        mesh.setInstanceCount(count)
+
+        self.update()
+
+    def update(self):
+        """
+        Uploads the current contents of self.matrices to the renderer.
+        """
+        self.buffer.setData(self.instance_buffer.sync())
 
 
 class Animation(object):
@@ -135,6 +184,70 @@ class Animation(object):
 
         return sphere_transform
 
+    def _disable_frustum_culling(self):
+        """
+        Turns off frustum culling in the default frame graph, so instanced entities are always drawn.
+        Qt3D bounds an instanced entity by its base mesh at the origin, ignoring the instance matrices,
+        so culling would hide every instance whenever the origin is out of view.
+        """
+        frame_graph = self.view.defaultFrameGraph()
+        if hasattr(frame_graph, 'setFrustumCullingEnabled'):
+            frame_graph.setFrustumCullingEnabled(False)
+        else:
+            # before the property existed, do what it does: take the culling node out of the frame graph,
+            # holding on to it since the frame graph still points to it
+            for node in frame_graph.findChildren(QFrustumCulling):
+                node.setParent(None)
+                self.frustum_culling = node
+
+    def add_instanced_spheres(self, r, count):
+        """
+        Helper method to add many spheres to the scene, drawn together.
+
+        Arguments:
+            r: float, the radius of the spheres
+            count: int, the number of spheres
+
+        Returns:
+            the Instances of the spheres
+        """
+        sphere_entity = QEntity(self.scene)
+        sphere_mesh = QSphereMesh()
+        sphere_mesh.setRadius(r)
+        sphere_entity.addComponent(sphere_mesh)
+        if not hasattr(self, 'instanced_material'):
+            self.instanced_material = self.load_qml(os.path.join(os.path.dirname(__file__), 'InstancedMaterial.qml'), self.scene)
+        sphere_entity.addComponent(self.instanced_material)
+        self._disable_frustum_culling()
+
+        return Instances(sphere_mesh, count)
+
+    def add_instanced_rgb_cubes(self, w, h, d, count):
+        """
+        Helper method to add many RGB-textured cubes to the scene, drawn together.
+
+        Arguments:
+            w: float, the width of the cubes
+            h: float, the height of the cubes
+            d: float, the depth of the cubes
+            count: int, the number of cubes
+
+        Returns:
+            the Instances of the cubes
+        """
+        cube_entity = QEntity(self.scene)
+        cube_mesh = QCuboidMesh()
+        cube_mesh.setXExtent(w)
+        cube_mesh.setYExtent(h)
+        cube_mesh.setZExtent(d)
+        cube_entity.addComponent(cube_mesh)
+        if not hasattr(self, 'instanced_rgb_cube_material'):
+            self.instanced_rgb_cube_material = self.load_qml(os.path.join(os.path.dirname(__file__), 'InstancedRGBCubeMaterial.qml'), self.scene)
+        cube_entity.addComponent(self.instanced_rgb_cube_material)
+        self._disable_frustum_culling()
+
+        return Instances(cube_mesh, count)
+
     def add_path(self, *pts):
         """
         Helper method to add a path to the scene.
@@ -170,6 +283,20 @@ class Animation(object):
             prev_pt = pt
         return entities
 
+    def box_in_view(self, box):
+        """
+        Checks whether an axis-aligned box is at least partly inside the camera's view.
+
+        Arguments:
+            box: (2, 3) array, the min and max corner of the box
+
+        Returns:
+            False if the box is definitely out of view, True otherwise
+        """
+        camera = self.view.camera()
+        view_projection = camera.projectionMatrix() * camera.viewMatrix()
+        return box_in_frustum(box, np.array(view_projection.copyDataTo()).reshape(4, 4))
+
     def setup_scene(self, background_color, camera_position, camera_lookat):
         """
         Sets up the scene. Should be called before running the animation.
@@ -191,6 +318,9 @@ class Animation(object):
         camera = self.view.camera()
         camera.setPosition(camera_position)
         camera.setViewCenter(camera_lookat)
+        # the window sets the camera's aspect ratio once it has its size, after the scene is made
+        camera.projectionMatrixChanged.connect(lambda projection_matrix: self.view_changed())
+        camera.viewMatrixChanged.connect(self.view_changed)
 
         self.view.setRootEntity(self.scene)
 
@@ -200,9 +330,12 @@ class Animation(object):
         """
         raise NotImplementedError()
 
-    def _update(self):
+    def _step(self):
         """
-        Updates the animation, rendering the next frame.
+        Advances the animation by one frame.
+
+        Returns:
+            True if the animation has run past run_time
         """
         # current animation time in seconds
         t = util.lerp(self.frame, 0, self.frame_rate, 0, 1)
@@ -211,14 +344,20 @@ class Animation(object):
         # call subclass's frame update
         self.update(self.frame, t, dt)
 
+        self.prev_update_time = t
+        self.frame += 1
+
+        return t >= self.run_time
+
+    def _update(self):
+        """
+        Updates the animation, rendering the next frame.
+        """
         # stop the animation and close the window if run past run_time
-        if t >= self.run_time:
+        if self._step():
             self.animation_timer.stop()
             self.view.close()
 
-        self.prev_update_time = t
-        self.frame += 1
-
     def update(self, frame, t, dt):
         """
         Abstract method. Updates one frame of the animation.
@@ -230,6 +369,20 @@ class Animation(object):
         """
         raise NotImplementedError()
 
+    def view_changed(self):
+        """
+        Called whenever the camera's view or projection changes, such as when the window is resized.
+        Does nothing by default, subclasses can override it to update anything that depends on what's in view.
+        """
+        pass
+
+    def finish(self):
+        """
+        Called once after the animation has stopped running. Does nothing by default,
+        subclasses can override it to release any resources they hold.
+        """
+        pass
+
     def run(self):
         """
         Runs the animation asynchronously. The animation runs in the background for self.run_time seconds.
@@ -243,3 +396,93 @@ class Animation(object):
 
         # show the main window
         self.view.show()
+
+    def capture(self, out_dir, width=1280, height=720, num_workers=4):
+        """
+        Captures the animation to a sequence of PNG images instead of running it in real time.
+        Each frame is rendered at a fixed timestep of 1 / self.frame_rate, independent of how long rendering takes,
+        and the next frame starts as soon as the previous one is captured. Images are encoded on a thread pool.
+        Nothing has to be shown when using Qt's offscreen platform, but on Linux it still gets its OpenGL context
+        from an X server, so a headless machine needs a virtual one such as Xvfb and a software OpenGL such as Mesa's llvmpipe.
+
+        Arguments:
+            out_dir: str, the directory to save the images in, created if needed
+            width: int, the width of the images
+            height: int, the height of the images
+            num_workers: int, the number of threads encoding images
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        self.capture_dir = out_dir
+        self.capture_pool = ThreadPoolExecutor(num_workers)
+        # images still being encoded, limited so rendering can't get too far ahead of encoding
+        self.capture_pending = collections.deque()
+        self.capture_max_pending = 2 * num_workers
+        self.capture_reply = None
+        self.captured_frames = 0
+
+        # put a render capture at the root of the frame graph, so it grabs everything the frame graph renders
+        self.render_capture = QRenderCapture()
+        frame_graph = self.view.activeFrameGraph()
+        frame_graph.setParent(self.render_capture)
+        self.view.setActiveFrameGraph(self.render_capture)
+
+        self.view.resize(width, height)
+        self.view.show()
+
+        self.capture_start_time = time.perf_counter()
+        self._capture_next()
+
+    def _capture_next(self):
+        """
+        Advances the animation by one frame and requests a capture of it.
+        """
+        frame = self.frame
+        done = self._step()
+        # Qt3D hands changes to its renderer asynchronously, but in the order they were made,
+        # so the renderer sees this frame's updates before the request and the capture shows them
+        self.capture_reply = self.render_capture.requestCapture(frame)
+        self.capture_reply.completeChanged.connect(lambda complete: self._captured(frame, done) if complete else None)
+
+    def _captured(self, frame, done):
+        """
+        Called when a frame's capture is complete. Hands the image off to be saved and moves on to the next frame.
+
+        Arguments:
+            frame: int, the captured frame number
+            done: bool, whether this was the last frame
+        """
+        image = self.capture_reply.image()
+        self.capture_reply.deleteLater()
+        self.capture_reply = None
+
+        # wait for the oldest image to be saved if too many are waiting to be encoded
+        if len(self.capture_pending) >= self.capture_max_pending:
+            self._check_saved(self.capture_pending.popleft())
+        path = os.path.join(self.capture_dir, 'frame{:05d}.png'.format(frame))
+        self.capture_pending.append((path, self.capture_pool.submit(image.save, path, 'PNG')))
+        self.captured_frames += 1
+
+        if not done:
+            # let Qt process events before rendering the next frame
+            QTimer.singleShot(0, self._capture_next)
+            return
+
+        # wait for all images to be saved
+        while self.capture_pending:
+            self._check_saved(self.capture_pending.popleft())
+        self.capture_pool.shutdown()
+        elapsed = time.perf_counter() - self.capture_start_time
+        print('Captured {} frames to {} in {:.2f} s ({:.1f} frames per second)'.format(
+            self.captured_frames, self.capture_dir, elapsed, self.captured_frames / elapsed))
+        self.view.close()
+
+    def _check_saved(self, pending):
+        """
+        Waits for an image to be saved and reports if it couldn't be.
+
+        Arguments:
+            pending: (path, future), the path being saved to and the future of the save
+        """
+        path, future = pending
+        if not future.result():
+            print('Error saving {}'.format(path))
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def box_in_frustum(box, view_projection):
+    """
+    Checks whether an axis-aligned box is at least partly inside a view frustum.
+
+    Arguments:
+        box: (2, 3) array, the min and max corner of the box
+        view_projection: (4, 4) array, the matrix taking world coordinates to clip space, indexed [row, column]
+
+    Returns:
+        False if the box is definitely out of view, True otherwise
+    """
+    # transform the box's corners to clip space
+    box = np.asarray(box)
+    corners = np.array([(x, y, z, 1) for x in box[:, 0] for y in box[:, 1] for z in box[:, 2]])
+    clip = corners @ np.asarray(view_projection).T
+    w = clip[:, 3:]
+    # the box is out of view if all of its corners are outside the same clipping plane
+    outside = np.concatenate([clip[:, :3] < -w, clip[:, :3] > w], axis=1)
+    return not outside.all(axis=0).any()
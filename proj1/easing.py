@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+# standard easing curves, each maps an array of values from 0 to 1 onto 0 to 1
+EASINGS = {
+    'linear': lambda t: t,
+    'ease-in': lambda t: t * t * t,
+    'ease-out': lambda t: 1 - (1 - t) ** 3,
+    'ease-in-out': lambda t: np.where(t < 0.5, 4 * t * t * t, 1 - 4 * (1 - t) ** 3),
+    'smoothstep': lambda t: t * t * (3 - 2 * t),
+    'sine': lambda t: (1 - np.cos(t * np.pi)) / 2,
+}
+
+
+class TimeWarp(object):
+    """
+    Remaps a spline's interpolation parameter through a monotone curve, such as an easing function.
+    The curve is baked into a uniformly spaced lookup table so evaluating it is just a linear
+    interpolation between two table entries, no matter how expensive the curve is.
+    """
+
+    def __init__(self, curve, resolution=1024):
+        """
+        Creates a new TimeWarp.
+
+        Arguments:
+            curve: either a function taking a numpy array of values from 0 to 1 and returning the warped values,
+                   or a list of floats, the warped values at evenly spaced points from 0 to 1,
+                   which must not decrease and must start at 0 and end at 1
+            resolution: int, the number of entries in the lookup table, only used when curve is a function
+        """
+        if callable(curve):
+            assert resolution >= 2
+            table = curve(np.linspace(0, 1, resolution))
+        else:
+            table = curve
+        self.table = np.array(table, dtype=float)
+        if self.table.ndim != 1 or len(self.table) < 2:
+            raise ValueError('time warp needs at least 2 values')
+        if np.any(np.diff(self.table) < 0):
+            raise ValueError('time warp curve must not decrease')
+        # the spline has to start and end where it would without the warp
+        if not (abs(self.table[0]) < 1e-9 and abs(self.table[-1] - 1) < 1e-9):
+            raise ValueError('time warp curve must go from 0 to 1')
+        # remove rounding error from curve functions
+        self.table[0] = 0
+        self.table[-1] = 1
+        # plain list for fast scalar lookups
+        self._values = self.table.tolist()
+        self._last = len(self._values) - 1
+
+    def __call__(self, t):
+        """
+        Warps a single value.
+
+        Arguments:
+            t: float, the value from 0 to 1 to warp
+
+        Returns:
+            the warped value
+        """
+        # clamp to table, values outside [0, 1] hold the endpoints
+        if t <= 0:
+            return self._values[0]
+        if t >= 1:
+            return self._values[-1]
+        # scale t to be an index into the table
+        t *= self._last
+        # get integer and fractional parts of this
+        i = min(int(t), self._last - 1)
+        t -= i
+        a = self._values[i]
+        return a + (self._values[i + 1] - a) * t
+
+    def evaluate(self, ts):
+        """
+        Warps an array of values at once.
+
+        Arguments:
+            ts: numpy array of floats from 0 to 1, the values to warp
+
+        Returns:
+            numpy array of the warped values
+        """
+        t = np.clip(np.asarray(ts, dtype=float), 0, 1) * self._last
+        i = np.minimum(t.astype(int), self._last - 1)
+        t -= i
+        a = self.table[i]
+        return a + (self.table[i + 1] - a) * t
+
+def parse_time_warp(text):
+    """
+    Creates a TimeWarp from its text description, as used in spline spec files and on the command line.
+
+    Arguments:
+        text: str, either the name of one of EASINGS or comma-separated floats giving the curve's values
+              at evenly spaced points from 0 to 1
+
+    Returns:
+        the TimeWarp, or None for a linear curve
+    """
+    text = text.strip()
+    if text == 'linear':
+        # nothing to warp
+        return None
+    if text in EASINGS:
+        return TimeWarp(EASINGS[text])
+    try:
+        values = [float(value) for value in text.split(',')]
+    except ValueError:
+        raise ValueError('unknown time warp {!r}, expected one of {} or a list of values'.format(text, ', '.join(sorted(EASINGS))))
+    return TimeWarp(values)
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from .spline import CatmullRomSpline, UniformBSpline, NURBSSpline, clamped_knots, find_spans, de_boor
+
+
+# fewest control points either spline type can be evaluated with
+MIN_CTRL_PTS = 4
+
+
+class _WindowBasis(object):
+    """
+    Stand-in for a spline's list of control points where each point is a unit vector
+    over a small window of control point indices.
+    Evaluating a spline's control points with this gives the linear weights that the
+    spline applies to its real control points, without having to duplicate its logic.
+    """
+
+    def __init__(self, num_ctrl_pts, start, size):
+        self.num_ctrl_pts = num_ctrl_pts
+        self.start = start
+        self.eye = np.eye(size)
+
+    def __len__(self):
+        return self.num_ctrl_pts
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self.num_ctrl_pts))]
+        if i < 0:
+            i += self.num_ctrl_pts
+        return self.eye[i - self.start]
+
+def _segments(spline_type, num_ctrl_pts, ts):
+    """
+    Splits parameter values into the spline segments they fall in.
+
+    Arguments:
+        spline_type: type, the Spline subclass
+        num_ctrl_pts: int, the number of control points of the spline
+        ts: numpy array of floats from 0 to 1, the parameter values
+
+    Returns:
+        an iterator of (sample_indices, start, weights) for each segment, where:
+            sample_indices: numpy array of ints, indices into ts of the parameter values in the segment
+            start: int, index of the first control point the segment uses
+            weights: (len(sample_indices), k) numpy array, the weight of control points start to start + k for each parameter value
+    """
+    M = np.array(spline_type.M.copyDataTo()).reshape(4, 4)
+    num_segments = num_ctrl_pts + spline_type.i_end - spline_type.i_start
+    # same parameter scaling as Spline.pos_at, but with t = 1 evaluated at the end of the last segment,
+    # since the animation moves on to the next spline before reaching t = 1 and never shows pos_at(1)
+    s = ts * num_segments
+    i = np.minimum(s.astype(int), num_segments - 1)
+    u = s - i
+    i += spline_type.i_start
+    U = np.stack([u * u * u, u * u, u, np.ones_like(u)], axis=1)
+
+    spline = spline_type(0)
+    for seg in np.unique(i):
+        # every segment only depends on the control points between one before it and three after it
+        start = max(seg - 1, 0)
+        size = min(5, num_ctrl_pts - start)
+        spline.ctrl_pts = _WindowBasis(num_ctrl_pts, start, size)
+        S = np.stack(spline._get_ctrl_pts(seg))
+        sample_indices = np.nonzero(i == seg)[0]
+        yield sample_indices, start, U[sample_indices] @ M @ S
+
+def _solve(spline_type, num_ctrl_pts, points, ts):
+    """
+    Finds the least-squares control points for a fixed number of control points.
+
+    Returns:
+        (ctrl_pts, errors) where:
+            ctrl_pts: (num_ctrl_pts, 3) numpy array, the control points
+            errors: (len(points),) numpy array, the distance from each point to the fitted spline
+    """
+    segments = list(_segments(spline_type, num_ctrl_pts, ts))
+    # accumulate normal equations segment by segment instead of building the full (mostly zero) design matrix
+    AtA = np.zeros((num_ctrl_pts, num_ctrl_pts))
+    AtP = np.zeros((num_ctrl_pts, 3))
+    for sample_indices, start, W in segments:
+        window = slice(start, start + W.shape[1])
+        AtA[window, window] += W.T @ W
+        AtP[window] += W.T @ points[sample_indices]
+    ctrl_pts = np.linalg.lstsq(AtA, AtP, rcond=None)[0]
+
+    errors = np.empty(len(points))
+    for sample_indices, start, W in segments:
+        fitted = W @ ctrl_pts[start : start + W.shape[1]]
+        errors[sample_indices] = np.linalg.norm(fitted - points[sample_indices], axis=1)
+    return ctrl_pts, errors
+
+def fit_spline(points, tolerance, spline_type=CatmullRomSpline, ts=None, max_ctrl_pts=None):
+    """
+    Fits a spline to a dense sequence of points, using as few control points as possible
+    while keeping every point within the given distance of the spline.
+
+    The number of control points is grown geometrically until the least-squares fit is
+    within tolerance, then narrowed down with a binary search.
+    Since both spline types have uniformly spaced knots, each trial refits the whole curve,
+    and the error doesn't always shrink as control points are added, so the result is
+    small but not guaranteed to be the smallest possible.
+
+    Arguments:
+        points: (N, 3) array, the points to fit, in the order they should be travelled
+        tolerance: float, the maximum allowed distance from any point to the spline
+        spline_type: type, CatmullRomSpline or UniformBSpline
+        ts: (N,) array of floats from 0 to 1, the spline parameter of each point,
+            defaults to evenly spaced which keeps uniformly sampled points at the same times
+        max_ctrl_pts: int, the most control points to try, defaults to the number of points
+
+    Returns:
+        (ctrl_pts, max_error, rms_error) where:
+            ctrl_pts: (n, 3) numpy array, the fitted control points
+            max_error: float, the largest distance from a point to the fitted spline
+            rms_error: float, the root mean square distance from the points to the fitted spline
+    """
+    assert spline_type in (CatmullRomSpline, UniformBSpline)
+    points = np.asarray(points, dtype=float)
+    assert points.ndim == 2 and points.shape[1] == 3
+    assert len(points) >= MIN_CTRL_PTS
+    if ts is None:
+        ts = np.linspace(0, 1, len(points))
+    else:
+        ts = np.clip(np.asarray(ts, dtype=float), 0, 1)
+    if max_ctrl_pts is None:
+        max_ctrl_pts = len(points)
+    max_ctrl_pts = max(max_ctrl_pts, MIN_CTRL_PTS)
+
+    def fit(n):
+        ctrl_pts, errors = _solve(spline_type, n, points, ts)
+        return ctrl_pts, errors, errors.max() <= tolerance
+
+    # grow until within tolerance
+    lo = MIN_CTRL_PTS
+    hi = lo
+    best = fit(hi)
+    while not best[2] and hi < max_ctrl_pts:
+        lo = hi + 1
+        hi = min(hi * 2, max_ctrl_pts)
+        best = fit(hi)
+    # find the fewest control points still within tolerance
+    if best[2]:
+        while lo < hi:
+            mid = (lo + hi) // 2
+            result = fit(mid)
+            if result[2]:
+                hi = mid
+                best = result
+            else:
+                lo = mid + 1
+
+    ctrl_pts, errors, _ = best
+    return ctrl_pts, float(errors.max()), float(np.sqrt(np.mean(errors * errors)))
+
+def fit_nurbs(points, tolerance, degree=3, ts=None, max_ctrl_pts=None):
+    """
+    Fits a NURBSSpline (with all weights 1) to a dense sequence of points, keeping every point
+    within the given distance of the spline.
+
+    Starts with no interior knots, and after each least-squares fit inserts a knot in the middle
+    of every knot span where the error is too high, so control points are only added where
+    the path needs them.
+
+    Arguments:
+        points: (N, 3) array, the points to fit, in the order they should be travelled
+        tolerance: float, the maximum allowed distance from any point to the spline
+        degree: int, the degree of the spline
+        ts: (N,) array of floats from 0 to 1, the spline parameter of each point,
+            defaults to evenly spaced which keeps uniformly sampled points at the same times
+        max_ctrl_pts: int, the most control points to use, defaults to the number of points
+
+    Returns:
+        (ctrl_pts, knots, max_error, rms_error) where:
+            ctrl_pts: (n, 3) numpy array, the fitted control points
+            knots: (n + degree + 1,) numpy array, the knot vector
+            max_error: float, the largest distance from a point to the fitted spline
+            rms_error: float, the root mean square distance from the points to the fitted spline
+    """
+    points = np.asarray(points, dtype=float)
+    assert points.ndim == 2 and points.shape[1] == 3
+    assert len(points) > degree >= 1
+    if ts is None:
+        ts = np.linspace(0, 1, len(points))
+    else:
+        ts = np.clip(np.asarray(ts, dtype=float), 0, 1)
+    if max_ctrl_pts is None:
+        max_ctrl_pts = len(points)
+    max_ctrl_pts = max(max_ctrl_pts, degree + 1)
+
+    # the basis functions are De Boor's algorithm applied to unit vectors
+    unit_basis = np.broadcast_to(np.eye(degree + 1), (len(ts), degree + 1, degree + 1))
+    offsets = np.arange(-degree, 1)
+
+    # start with a single polynomial segment
+    knots = clamped_knots(degree + 1, degree)
+    while True:
+        num_ctrl_pts = len(knots) - degree - 1
+        spans = find_spans(knots, degree, ts)
+        N = de_boor(knots, degree, ts, spans, unit_basis)
+        # control point index of each basis function
+        cols = spans[:, np.newaxis] + offsets
+
+        # least-squares control points from the normal equations
+        AtA = np.zeros((num_ctrl_pts, num_ctrl_pts))
+        np.add.at(AtA, (cols[:, :, np.newaxis], cols[:, np.newaxis, :]), N[:, :, np.newaxis] * N[:, np.newaxis, :])
+        AtP = np.zeros((num_ctrl_pts, 3))
+        np.add.at(AtP, cols, N[:, :, np.newaxis] * points[:, np.newaxis, :])
+        ctrl_pts = np.linalg.lstsq(AtA, AtP, rcond=None)[0]
+
+        fitted = np.einsum('mk,mkd->md', N, ctrl_pts[cols])
+        errors = np.linalg.norm(fitted - points, axis=1)
+        if errors.max() <= tolerance or num_ctrl_pts >= max_ctrl_pts:
+            break
+
+        # split the spans with too much error, worst first
+        span_errors = np.zeros(len(knots))
+        np.maximum.at(span_errors, spans, errors)
+        bad = np.nonzero(span_errors > tolerance)[0]
+        bad = bad[np.argsort(-span_errors[bad])][:max_ctrl_pts - num_ctrl_pts]
+        knots = np.sort(np.concatenate([knots, (knots[bad] + knots[bad + 1]) / 2]))
+
+    return ctrl_pts, knots, float(errors.max()), float(np.sqrt(np.mean(errors * errors)))
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from .spline import SPLINE_TYPES, read_spec, write_spec
+
+    parser = argparse.ArgumentParser(
+        prog='proj1.fitting',
+        description='Fits a spline to a dense sequence of points and writes it as a spline specification file.')
+    parser.add_argument('points', help='Path to a .npy file or a comma-separated text file of X, Y, Z points.')
+    parser.add_argument('spline_spec', help='Path to write the spline specification to.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Maximum distance from any point to the spline (default: %(default)s).')
+    parser.add_argument('--type', choices=sorted(SPLINE_TYPES), default='catmull-rom', help='Type of spline to fit (default: %(default)s).')
+    parser.add_argument('--degree', type=int, default=3, help='Degree of the spline when fitting a NURBS (default: %(default)s).')
+    parser.add_argument('--time', type=float, default=10.0, help='Number of seconds to animate the spline for (default: %(default)s).')
+    args = parser.parse_args()
+
+    if args.points.endswith('.npy'):
+        points = np.load(args.points)
+    else:
+        points = np.loadtxt(args.points, delimiter=',', ndmin=2)
+
+    spline_type = SPLINE_TYPES[args.type]
+    if spline_type is NURBSSpline:
+        ctrl_pts, knots, max_error, rms_error = fit_nurbs(points, args.tolerance, args.degree)
+        # points carry no orientation, so every rotation is left at zero
+        write_spec(args.spline_spec, args.time, ctrl_pts, np.zeros_like(ctrl_pts), spline_type, args.degree, knots)
+    else:
+        ctrl_pts, max_error, rms_error = fit_spline(points, args.tolerance, spline_type)
+        write_spec(args.spline_spec, args.time, ctrl_pts, np.zeros_like(ctrl_pts), spline_type)
+    # a spec without its type would also be animated as the other spline types, which weren't fitted
+    splines, _ = read_spec(args.spline_spec)
+    assert [type(spline) for spline in splines] == [spline_type]
+
+    print('{} points -> {} control points, max error {:.6g}, RMS error {:.6g}'.format(len(points), len(ctrl_pts), max_error, rms_error))
+    sys.exit(0 if max_error <= args.tolerance else 1)
@@ -0,0 +1,16 @@
+#version 330 core
+
+// fragment shader for instanced material
+
+in vec3 normal;
+
+out vec4 fragColor;
+
+uniform vec3 color;
+uniform vec3 lightDirection;
+
+void main() {
+    // ambient plus a little diffuse from a fixed direction
+    float diffuse = max(dot(normalize(normal), -normalize(lightDirection)), 0.0);
+    fragColor = vec4(color * (0.5 + 0.5 * diffuse), 1.0);
+}
@@ -0,0 +1,21 @@
+#version 330 core
+
+// vertex shader for instanced material
+
+in vec3 vertexPosition;
+in vec3 vertexNormal;
+// per-instance model matrix
+in mat4 instanceModel;
+
+out vec3 normal;
+
+uniform mat4 modelMatrix;
+uniform mat4 viewProjectionMatrix;
+
+void main() {
+    mat4 model = modelMatrix * instanceModel;
+    // instances are only uniformly scaled, so the model matrix can transform normals too
+    normal = mat3(model) * vertexNormal;
+
+    gl_Position = viewProjectionMatrix * model * vec4(vertexPosition, 1.0);
+}
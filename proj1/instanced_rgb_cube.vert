@@ -0,0 +1,19 @@
+#version 330 core
+
+// vertex shader for instanced RGB cube material
+
+in vec3 vertexPosition;
+// per-instance model matrix
+in mat4 instanceModel;
+
+out vec3 position;
+
+uniform mat4 modelMatrix;
+uniform mat4 viewProjectionMatrix;
+
+void main() {
+    // output position to be used in fragment shader to figure out color
+    position = vertexPosition;
+
+    gl_Position = viewProjectionMatrix * modelMatrix * instanceModel * vec4(vertexPosition, 1.0);
+}
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+import struct
+
+import numpy as np
+from PyQt5.QtCore import QByteArray
+
+from .quaternion import Quaternion
+
+
+# number of floats in each instance's entry of an instance buffer, one column-major 4x4 model matrix
+INSTANCE_SIZE = 16
+# one instance's model matrix in native float32, the same layout as a row of an instance buffer
+MATRIX = struct.Struct('={}f'.format(INSTANCE_SIZE))
+
+
+def rotation_matrices(rotations):
+    """
+    Vectorized version of Quaternion.mat3x3.
+
+    Arguments:
+        rotations: (N, 4) array, the (s, x, y, z) components of unit quaternions
+
+    Returns:
+        (N, 3, 3) numpy array of rotation matrices, indexed [instance, row, column]
+    """
+    s, x, y, z = np.asarray(rotations, dtype=float).T
+    return np.stack([
+        1 - 2 * (y * y + z * z),     2 * (x * y - s * z),     2 * (x * z + s * y),
+            2 * (x * y + s * z), 1 - 2 * (x * x + z * z),     2 * (y * z - s * x),
+            2 * (x * z - s * y),     2 * (y * z + s * x), 1 - 2 * (x * x + y * y),
+    ], axis=1).reshape(-1, 3, 3)
+
+def pack_instance_matrices(positions, rotations=None, scales=None, out=None):
+    """
+    Packs instance transforms into the layout of an instance buffer: one 4x4 model matrix
+    per instance, in the column-major order OpenGL reads matrix attributes in.
+
+    Arguments:
+        positions: (N, 3) array, the translation of each instance
+        rotations: (N, 4) array, the (s, x, y, z) rotation quaternion of each instance, defaults to no rotation
+        scales: float or (N,) array, the uniform scale of each instance, defaults to 1
+        out: (N, 16) float32 numpy array to pack into in place, defaults to a new array
+
+    Returns:
+        the (N, 16) float32 numpy array of packed matrices
+    """
+    positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+    count = len(positions)
+    if out is None:
+        out = np.empty((count, INSTANCE_SIZE), dtype=np.float32)
+    assert out.shape == (count, INSTANCE_SIZE)
+    # view each matrix as [column, row]
+    m = out.reshape(count, 4, 4)
+
+    if rotations is None:
+        m[:, :3, :3] = np.eye(3)
+    else:
+        # transpose to go from [row, column] to [column, row]
+        m[:, :3, :3] = rotation_matrices(rotations).transpose(0, 2, 1)
+    if scales is not None:
+        m[:, :3, :3] *= np.reshape(scales, (-1, 1, 1))
+    m[:, :3, 3] = 0
+    m[:, 3, :3] = positions
+    m[:, 3, 3] = 1
+    return out
+
+class TransformSink(object):
+    """
+    Writes per-frame object transforms straight into a preallocated instance buffer,
+    in the same layout as pack_instance_matrices, without building any matrix or quaternion objects.
+    """
+
+    def __init__(self, out):
+        """
+        Creates a new TransformSink.
+
+        Arguments:
+            out: (N, 16) C-contiguous float32 numpy array to write into, such as Instances.matrices
+        """
+        assert out.dtype == np.float32 and out.ndim == 2 and out.shape[1] == INSTANCE_SIZE
+        assert out.flags.c_contiguous
+        self.out = out
+
+    def write(self, i, x, y, z, s, qx, qy, qz):
+        """
+        Overwrites the transform of one object.
+
+        Arguments:
+            i: int, the index of the object
+            x, y, z: floats, the position of the object
+            s, qx, qy, qz: floats, the components of the object's unit rotation quaternion
+        """
+        # same formula as Quaternion.mat4x4, written out column by column
+        MATRIX.pack_into(self.out, i * MATRIX.size,
+            1 - 2 * (qy * qy + qz * qz),     2 * (qx * qy + s * qz),     2 * (qx * qz - s * qy), 0,
+                2 * (qx * qy - s * qz), 1 - 2 * (qx * qx + qz * qz),     2 * (qy * qz + s * qx), 0,
+                2 * (qx * qz + s * qy),     2 * (qy * qz - s * qx), 1 - 2 * (qx * qx + qy * qy), 0,
+                                     x,                           y,                           z, 1)
+
+class SplineFollower(object):
+    """
+    Moves one object along a spline, turning it through a track of rotation keys, and writes its transform
+    into an instance buffer through a TransformSink. Reuses the same lists every frame so nothing is allocated.
+    """
+
+    def __init__(self, rotation_times, rotations, sink, i=0):
+        """
+        Creates a new SplineFollower.
+
+        Arguments:
+            rotation_times: sorted list of floats, the spline parameter of each rotation key
+            rotations: list of Quaternion's, the rotation keys
+            sink: TransformSink, where the object's transform is written
+            i: int, the index of the object in the sink
+        """
+        self.rotation_times = rotation_times
+        self.rotations = rotations
+        self.sink = sink
+        self.i = i
+        # position and rotation of the object, overwritten every frame
+        self.pos = [0.0] * 3
+        self.rot = [1.0, 0.0, 0.0, 0.0]
+
+    def update(self, spline, spline_t):
+        """
+        Moves the object to a point on a spline and writes its transform. Afterwards self.pos holds
+        its x, y, z position and self.rot the s, x, y, z components of its rotation.
+
+        Arguments:
+            spline: Spline, the spline to follow
+            spline_t: float, the spline parameter, before the spline's time warp
+        """
+        if spline.time_warp is not None:
+            # ease spline parameter
+            spline_t = spline.time_warp(spline_t)
+
+        # get spline point, into a reused list instead of a new vector every frame
+        spline.write_pos(spline_t, self.pos)
+        x, y, z = self.pos
+        # slerp rotations, likewise into a reused list
+        Quaternion.write_slerp_keys(spline_t, self.rotation_times, self.rotations, self.rot)
+        s, qx, qy, qz = self.rot
+
+        self.sink.write(self.i, x, y, z, s, qx, qy, qz)
+
+class InstanceBuffer(object):
+    """
+    Per-instance model matrices and the one QByteArray they're handed to the renderer in.
+    """
+
+    def __init__(self, count):
+        """
+        Creates a new InstanceBuffer. All instances start with the identity matrix.
+
+        Arguments:
+            count: int, the number of instances
+        """
+        # fill this in place, see pack_instance_matrices and TransformSink
+        self.matrices = np.zeros((count, INSTANCE_SIZE), dtype=np.float32)
+        self.matrices.reshape(count, 4, 4)[:] = np.eye(4)
+        # byte view of the matrices, made once
+        self._bytes = self.matrices.data.cast('B')
+        self.data = QByteArray(bytes(self.matrices.nbytes))
+
+    def sync(self):
+        """
+        Copies the matrices into self.data.
+
+        Returns:
+            self.data, ready to be uploaded
+        """
+        # Qt shares the array with whatever it was last handed to, and the write detaches it first,
+        # so the renderer never sees a half-written frame and no new QByteArray is needed
+        memoryview(self.data)[:] = self._bytes
+        return self.data
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def _as_array(rotations):
+    """
+    Converts a list of Quaternion's to a (k, 4) numpy array of (s, x, y, z) rows.
+    """
+    return np.array([(q.s, q.x, q.y, q.z) for q in rotations], dtype=float)
+
+def slerp_track(ts, times, quats):
+    """
+    Vectorized version of Quaternion.slerp_keys, evaluating a key track at many parameter values at once.
+
+    Arguments:
+        ts: (n,) numpy array, the interpolation parameters
+        times: (k,) sorted numpy array, the value of t at each key
+        quats: (k, 4) numpy array, the (s, x, y, z) components of the unit quaternion at each key
+
+    Returns:
+        (n, 4) numpy array of the interpolated quaternions
+    """
+    # index of the key at or before each t, clamped so there is always a next key
+    i = np.clip(np.searchsorted(times, ts, side='right') - 1, 0, len(times) - 2)
+    u = np.clip((ts - times[i]) / (times[i + 1] - times[i]), 0, 1)[:, np.newaxis]
+    q1 = quats[i]
+    q2 = quats[i + 1]
+    dot = np.sum(q1 * q2, axis=1)[:, np.newaxis]
+    # -q2 and q2 represent the same rotation, use whichever is closer to q1
+    q2 = np.where(dot < 0, -q2, q2)
+    dot = np.minimum(np.abs(dot), 1)
+    angle = np.arccos(dot)
+    sin_angle = np.sin(angle)
+    # fall back to plain lerp where the keys are (nearly) the same to avoid dividing by zero
+    close = sin_angle < 1e-6
+    safe_sin = np.where(close, 1, sin_angle)
+    w1 = np.where(close, 1 - u, np.sin((1 - u) * angle) / safe_sin)
+    w2 = np.where(close, u, np.sin(u * angle) / safe_sin)
+    return w1 * q1 + w2 * q2
+
+def angular_distance(q1, q2):
+    """
+    Vectorized angle between rotations.
+
+    Arguments:
+        q1: (n, 4) numpy array of quaternions
+        q2: (n, 4) numpy array of quaternions
+
+    Returns:
+        (n,) numpy array, the angle in radians of the rotation taking each q1 to q2
+    """
+    dot = np.abs(np.sum(q1 * q2, axis=1)) / (np.linalg.norm(q1, axis=1) * np.linalg.norm(q2, axis=1))
+    return 2 * np.arccos(np.minimum(dot, 1))
+
+def reduce_rotation_keys(rotations, tolerance, times=None, samples_per_key=4):
+    """
+    Removes rotation keys that aren't needed to keep the slerped orientation within the given angle
+    of the original track, Douglas-Peucker style: starting from just the end keys, the key
+    nearest the worst error in each span is kept, until every span is within tolerance.
+
+    Arguments:
+        rotations: list of Quaternion's, the rotation keys
+        tolerance: float, the largest allowed angle in radians between the original and reduced tracks
+        times: list of floats, the time of each key, defaults to evenly spaced from 0 to 1 as used by Quaternion.slerp
+        samples_per_key: int, the number of points between each pair of original keys where the error is measured
+
+    Returns:
+        (times, rotations, max_error) where:
+            times: list of floats, the time of each kept key
+            rotations: list of Quaternion's, the kept keys
+            max_error: float, the largest angle in radians between the original and reduced tracks
+    """
+    num_keys = len(rotations)
+    if times is None:
+        times = np.linspace(0, 1, num_keys)
+    else:
+        times = np.asarray(times, dtype=float)
+    assert len(times) == num_keys >= 2
+    quats = _as_array(rotations)
+
+    # dense parameter values where the tracks are compared, original key k is at sample k * samples_per_key
+    ts = np.concatenate([
+        np.linspace(times[k], times[k + 1], samples_per_key, endpoint=False)
+        for k in range(num_keys - 1)] + [times[-1:]])
+    reference = slerp_track(ts, times, quats)
+
+    keep = [0, num_keys - 1]
+    spans = [(0, num_keys - 1)]
+    while spans:
+        a, b = spans.pop()
+        if b - a < 2:
+            continue
+        # compare the span slerped between just its end keys with the original
+        start = a * samples_per_key
+        stop = b * samples_per_key + 1
+        approx = slerp_track(ts[start:stop], times[[a, b]], quats[[a, b]])
+        errors = angular_distance(approx, reference[start:stop])
+        worst = np.argmax(errors)
+        if errors[worst] <= tolerance:
+            continue
+        # keep the interior key closest to the worst sample and split the span there
+        k = min(max(int(round((start + worst) / samples_per_key)), a + 1), b - 1)
+        keep.append(k)
+        spans.append((a, k))
+        spans.append((k, b))
+
+    keep.sort()
+    reduced = slerp_track(ts, times[keep], quats[keep])
+    max_error = float(angular_distance(reduced, reference).max())
+    return [float(times[k]) for k in keep], [rotations[k] for k in keep], max_error
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import bisect
 import numbers
 import math
 
@@ -60,6 +61,78 @@ class Quaternion(object):
             # t is the interpolation parameter between them
             return Quaternion.slerp(t, rotations[i], rotations[i + 1])
 
+    @staticmethod
+    def slerp_keys(t, times, rotations):
+        """
+        Calculates a spherical linear interpolation between quaternion keys placed at the given times.
+        Unlike slerp, the keys don't have to be evenly spaced.
+
+        Arguments:
+            t: float, interpolation parameter
+            times: sorted list of floats, the value of t at each key
+            rotations: list of Quaternion's, the quaternion rotation at each key
+        """
+        assert len(times) == len(rotations) >= 2
+        # if t out of bounds, return the endpoints
+        if t <= times[0]:
+            return rotations[0]
+        if t >= times[-1]:
+            return rotations[-1]
+        # binary search for the key at or before t
+        i = bisect.bisect_right(times, t) - 1
+        # slerp between that key and the next
+        t = (t - times[i]) / (times[i + 1] - times[i])
+        return Quaternion.slerp(t, rotations[i], rotations[i + 1])
+
+    @staticmethod
+    def write_slerp_keys(t, times, rotations, out):
+        """
+        Same as slerp_keys, but writes the result into an existing list instead of making a Quaternion,
+        so it can be called every frame without allocating any objects that outlive the call.
+
+        Arguments:
+            t: float, interpolation parameter
+            times: sorted list of floats, the value of t at each key
+            rotations: list of Quaternion's, the quaternion rotation at each key
+            out: list of 4 floats, overwritten with the s, x, y, z components of the rotation
+        """
+        # if t out of bounds, use the endpoints
+        if t <= times[0]:
+            q = rotations[0]
+        elif t >= times[-1]:
+            q = rotations[-1]
+        else:
+            # binary search for the key at or before t
+            i = bisect.bisect_right(times, t) - 1
+            t = (t - times[i]) / (times[i + 1] - times[i])
+            q1 = rotations[i]
+            q2 = rotations[i + 1]
+            # same cases as slerp, with the weights of each quaternion worked out first
+            dot = q1.dot(q2)
+            w2 = 1.0
+            if dot < 0:
+                # use -q2 if it's closer to q1
+                w2 = -1.0
+                dot = -dot
+            # rounding can put the dot product of equal keys just above 1
+            dot = min(dot, 1.0)
+            if dot == 1.0:
+                q = q1
+            else:
+                angle = math.acos(dot)
+                sin_angle = math.sin(angle)
+                w1 = math.sin((1 - t) * angle) / sin_angle
+                w2 *= math.sin(t * angle) / sin_angle
+                out[0] = w1 * q1.s + w2 * q2.s
+                out[1] = w1 * q1.x + w2 * q2.x
+                out[2] = w1 * q1.y + w2 * q2.y
+                out[3] = w1 * q1.z + w2 * q2.z
+                return
+        out[0] = q.s
+        out[1] = q.x
+        out[2] = q.y
+        out[3] = q.z
+
     def __init__(self, s=1, x=0, y=0, z=0):
         """
         Creates a new Quaternion with the given components.
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import mmap
+import struct
+
+import numpy as np
+
+
+# file header: magic, format version, frame rate, number of frames, MD5 digest of the spline spec
+HEADER = struct.Struct('<4sHxxfI16s')
+MAGIC = b'P1TR'
+VERSION = 1
+# one record per frame: position (x, y, z) followed by rotation quaternion (s, x, y, z)
+RECORD = struct.Struct('<7f')
+
+
+def spec_digest(path):
+    """
+    Computes the digest of a spline spec file, used to tell which spec a recording was made from.
+
+    Arguments:
+        path: str, path to the spline spec file
+
+    Returns:
+        the 16-byte MD5 digest of the file's contents
+    """
+    with open(path, 'rb') as f:
+        return hashlib.md5(f.read()).digest()
+
+class TransformRecorder(object):
+    """
+    Appends per-frame transforms to a binary recording file.
+    """
+
+    def __init__(self, path, frame_rate, digest):
+        """
+        Creates a new recording file, overwriting any existing one.
+
+        Arguments:
+            path: str, path to the recording file
+            frame_rate: float, the frame rate of the animation being recorded
+            digest: bytes, digest of the spline spec being recorded, see spec_digest
+        """
+        self.path = path
+        self.frame_rate = frame_rate
+        self.digest = digest
+        self.num_frames = 0
+        self.file = open(path, 'wb')
+        # frame count is patched in when the recording is closed
+        self._write_header()
+
+    def _write_header(self):
+        """
+        Writes the header at the start of the file.
+        """
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.frame_rate, self.num_frames, self.digest))
+
+    def write(self, x, y, z, s, qx, qy, qz):
+        """
+        Appends one frame to the recording.
+
+        Arguments:
+            x, y, z: floats, the position of the object
+            s, qx, qy, qz: floats, the components of the object's rotation quaternion
+        """
+        self.file.write(RECORD.pack(x, y, z, s, qx, qy, qz))
+        self.num_frames += 1
+
+    def close(self):
+        """
+        Finishes the recording. Does nothing if already closed.
+        """
+        if self.file.closed:
+            return
+        self._write_header()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class TransformRecording(object):
+    """
+    Read-only, memory-mapped view of a recording made by TransformRecorder.
+    Frames are decoded on demand, so any frame can be looked up in constant time and memory.
+    """
+
+    def __init__(self, path):
+        """
+        Opens a recording file.
+
+        Arguments:
+            path: str, path to the recording file
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            raise ValueError('{} is not a transform recording'.format(path))
+        magic, version, self.frame_rate, num_frames, self.digest = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError('{} is not a transform recording'.format(path))
+        if version != VERSION:
+            raise ValueError('{} has unsupported recording version {}'.format(path, version))
+        # a recording that was never closed still has its frames, just not the count
+        available = (len(self.map) - HEADER.size) // RECORD.size
+        self.num_frames = num_frames if 0 < num_frames <= available else available
+
+    def __len__(self):
+        return self.num_frames
+
+    def __getitem__(self, frame):
+        """
+        Gets one frame of the recording.
+
+        Arguments:
+            frame: int, the frame number
+
+        Returns:
+            (x, y, z, s, qx, qy, qz), the position and rotation quaternion components of the frame
+        """
+        if frame < 0:
+            frame += self.num_frames
+        if not 0 <= frame < self.num_frames:
+            raise IndexError('frame {} out of range'.format(frame))
+        return RECORD.unpack_from(self.map, HEADER.size + frame * RECORD.size)
+
+    def bounds(self):
+        """
+        Finds the bounding box of the recorded positions.
+        The records are viewed in place as an array, so this doesn't copy or decode the recording.
+
+        Returns:
+            (min, max), each a numpy array of (x, y, z)
+        """
+        # the same little-endian floats as RECORD, one row per frame
+        records = np.frombuffer(self.map, dtype='<f4', count=self.num_frames * RECORD.size // 4, offset=HEADER.size)
+        positions = records.reshape(-1, RECORD.size // 4)[:, :3]
+        # the results are copies, so no view of the map outlives this call and it can still be closed
+        return positions.min(axis=0), positions.max(axis=0)
+
+    def close(self):
+        """
+        Closes the recording.
+        """
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,9 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import bisect
+
+import numpy as np
 from PyQt5.QtGui import QVector3D, QVector4D, QMatrix4x4
 
 from . import util
 from .quaternion import Quaternion
+from .easing import parse_time_warp
 
 
 def read_spec(path):
@@ -38,16 +42,30 @@ def read_spec(path):
         assert num_splines == 1
         # read each spline
         for _ in range(num_splines):
-            # read the number of control points in this spline
-            num_ctrl_pts = int(next(data_lines))
-            # read the time that this spline is supposed to be animated for
-            ani_time = float(next(data_lines))
+            # read the number of control points in this spline,
+            # optionally followed by the type of spline and, for NURBS, its degree
+            fields = [field.strip() for field in next(data_lines).split(',')]
+            num_ctrl_pts = int(fields[0])
+            spline_types = (SPLINE_TYPES[fields[1]],) if len(fields) > 1 else (CatmullRomSpline, UniformBSpline)
+            nurbs = spline_types == (NURBSSpline,)
+            degree = int(fields[2]) if len(fields) > 2 else 3
+            assert nurbs or len(fields) <= 2
+            # read the time that this spline is supposed to be animated for,
+            # optionally followed by a comma and a time warp for the spline parameter
+            ani_time_line = next(data_lines).split(',', 1)
+            ani_time = float(ani_time_line[0])
+            time_warp = parse_time_warp(ani_time_line[1]) if len(ani_time_line) > 1 else None
             ctrl_pts = []
+            weights = []
             rotations = []
             # read control points
             for _ in range(num_ctrl_pts):
                 # read line, split by commas, convert to floats
-                x, y, z = map(float, next(data_lines).split(', '))
+                values = list(map(float, next(data_lines).split(', ')))
+                # NURBS control points can have a weight after the position
+                assert len(values) == 3 or (nurbs and len(values) == 4)
+                x, y, z = values[:3]
+                weights.append(values[3] if len(values) == 4 else 1.0)
                 # add control point
                 ctrl_pt = QVector3D(x, y, z)
                 ctrl_pts.append(ctrl_pt)
@@ -58,13 +76,62 @@ def read_spec(path):
                 rot = Quaternion.from_euler_angles(x_rot, y_rot, z_rot)
                 rotations.append(rot)
 
+            # NURBS can be followed by its knot vector, otherwise knots are clamped and evenly spaced
+            knots = None
+            if nurbs:
+                knots_line = next(data_lines, None)
+                if knots_line is not None:
+                    knots = list(map(float, knots_line.split(', ')))
+
             # now make each kind of spline from the control points
             splines = []
-            for spline_type in (CatmullRomSpline, UniformBSpline):
-                splines.append(spline_type(ani_time, *ctrl_pts))
+            for spline_type in spline_types:
+                if nurbs:
+                    spline = NURBSSpline(ani_time, *ctrl_pts, degree=degree, knots=knots, weights=weights)
+                else:
+                    spline = spline_type(ani_time, *ctrl_pts)
+                spline.time_warp = time_warp
+                splines.append(spline)
 
             return splines, rotations
 
+def write_spec(path, ani_time, ctrl_pts, rotations, spline_type=None, degree=3, knots=None):
+    """
+    Function that writes a spline text file in the format read by read_spec.
+
+    Arguments:
+        path: str, path to the text file to write
+        ani_time: float, time in seconds to animate the spline for
+        ctrl_pts: list of (x, y, z) triples, the control points of the spline
+        rotations: list of (x_rot, y_rot, z_rot) triples, the Euler angles at each control point
+        spline_type: type, the Spline subclass to read the control points as,
+                     defaults to making both a CatmullRomSpline and a UniformBSpline
+        degree: int, the degree of a NURBSSpline
+        knots: list of floats, the knot vector of a NURBSSpline, defaults to clamped and evenly spaced
+    """
+    ctrl_pts = list(ctrl_pts)
+    rotations = list(rotations)
+    # spec has one rotation for each control point
+    assert len(ctrl_pts) == len(rotations)
+    with open(path, 'w') as f:
+        # number of splines
+        f.write('1\n')
+        # number of control points in this spline, and its type
+        fields = [str(len(ctrl_pts))]
+        if spline_type is not None:
+            fields += [name for name, t in SPLINE_TYPES.items() if t is spline_type]
+            if spline_type is NURBSSpline:
+                fields.append(str(degree))
+        f.write(', '.join(fields) + '\n')
+        # time that this spline is animated for
+        f.write('{!r}\n'.format(float(ani_time)))
+        for ctrl_pt, rot in zip(ctrl_pts, rotations):
+            f.write(', '.join(repr(float(x)) for x in ctrl_pt) + '\n')
+            f.write(', '.join(repr(float(x)) for x in rot) + '\n')
+        if knots is not None:
+            assert spline_type is NURBSSpline
+            f.write(', '.join(repr(float(k)) for k in knots) + '\n')
+
 class Spline(object):
     """
     Abstract class representing a parameterized spline.
@@ -85,6 +152,11 @@ class Spline(object):
         """
         self.ani_time = ani_time
         self.ctrl_pts = ctrl_pts
+        # optional TimeWarp applied to the animation's spline parameter, None for linear
+        self.time_warp = None
+        # computed on first use
+        self._segment_bounds = None
+        self._coefficients = None
 
     def _get_ctrl_pts(self, i):
         """
@@ -92,6 +164,75 @@ class Spline(object):
         """
         raise NotImplementedError()
 
+    @property
+    def num_segments(self):
+        """
+        Gets the number of polynomial segments in the spline.
+        """
+        return len(self.ctrl_pts) + self.i_end - self.i_start
+
+    @property
+    def segment_params(self):
+        """
+        Gets the range of the interpolation parameter covered by each segment of the spline.
+
+        Returns:
+            (num_segments, 2) numpy array, the start and end value of t of each segment
+        """
+        edges = np.linspace(0, 1, self.num_segments + 1)
+        return np.stack([edges[:-1], edges[1:]], axis=1)
+
+    def _segment_matrices(self):
+        """
+        Gets the matrices of the formula P(t) = U^T M B for every segment of the spline.
+
+        Returns:
+            (M, G) where:
+                M: (4, 4) numpy array, the M-matrix
+                G: (num_segments, 4, 3) numpy array, the four control points used by each segment
+        """
+        G = np.array([
+            [(p.x(), p.y(), p.z()) for p in self._get_ctrl_pts(i)]
+            for i in range(self.i_start, self.i_start + self.num_segments)])
+        M = np.array(self.M.copyDataTo()).reshape(4, 4)
+        return M, G
+
+    def _segment_hulls(self):
+        """
+        Gets points whose convex hull contains each segment of the spline.
+        Each segment is converted to Bezier form, since a Bezier curve always lies inside its control points.
+
+        Returns:
+            (num_segments, k, 3) numpy array of the hull points of each segment
+        """
+        M, G = self._segment_matrices()
+        # Bezier control points give the same curve with the Bezier M-matrix
+        return np.linalg.solve(BEZIER_M, M) @ G
+
+    @property
+    def segment_bounds(self):
+        """
+        Gets the axis-aligned bounding box of each segment of the spline. Computed once and cached.
+
+        Returns:
+            (num_segments, 2, 3) numpy array, the min and max corner of each segment's box
+        """
+        if self._segment_bounds is None:
+            hulls = self._segment_hulls()
+            self._segment_bounds = np.stack([hulls.min(axis=1), hulls.max(axis=1)], axis=1)
+        return self._segment_bounds
+
+    @property
+    def bounds(self):
+        """
+        Gets the axis-aligned bounding box of the whole spline.
+
+        Returns:
+            (2, 3) numpy array, the min and max corner of the box
+        """
+        segment_bounds = self.segment_bounds
+        return np.stack([segment_bounds[:, 0].min(axis=0), segment_bounds[:, 1].max(axis=0)])
+
     def pos_at(self, t):
         """
         Gets the position of the spline at the given value of the interpolation parameter.
@@ -127,6 +268,38 @@ class Spline(object):
         # left-multiplying a QVector4D with a QMatrix4x4 uses the QVector4D as a 1x4 row vector.
         return QVector3D(U * (self.M * B))
 
+    def write_pos(self, t, out):
+        """
+        Same as pos_at, but writes the position into an existing list instead of making a QVector3D.
+        Each segment's polynomial is worked out once, so this only does scalar arithmetic and can be
+        called every frame without allocating any objects that outlive the call.
+
+        Arguments:
+            t: float, the interpolation parameter
+            out: list of 3 floats, overwritten with the x, y, z of the position
+        """
+        if self._coefficients is None:
+            M, G = self._segment_matrices()
+            # polynomial coefficients of each segment, [t^3, t^2, t, 1] for x, then y, then z
+            C = (M @ G).transpose(0, 2, 1).reshape(-1, 12)
+            self._coefficients = [tuple(c) for c in C.tolist()]
+            self._end_pts = [(p.x(), p.y(), p.z()) for p in (self.ctrl_pts[0], self.ctrl_pts[-1])]
+        # if t out of bounds, use the endpoints
+        if t < 0:
+            out[0], out[1], out[2] = self._end_pts[0]
+            return
+        if t >= 1:
+            out[0], out[1], out[2] = self._end_pts[1]
+            return
+        # scale t to be a segment index, guarding against rounding up to the end
+        t *= len(self._coefficients)
+        i = min(int(t), len(self._coefficients) - 1)
+        t -= i
+        ax, bx, cx, dx, ay, by, cy, dy, az, bz, cz, dz = self._coefficients[i]
+        out[0] = ((ax * t + bx) * t + cx) * t + dx
+        out[1] = ((ay * t + by) * t + cy) * t + dy
+        out[2] = ((az * t + bz) * t + cz) * t + dz
+
     def __repr__(self):
         return type(self).__name__ + '(' + repr(self.ani_time) + ''.join(', ' + repr(pt) for pt in self.ctrl_pts) + ')'
 
@@ -193,3 +366,208 @@ class UniformBSpline(Spline):
         """
         # control points for this are just the four points starting at each index
         return self.ctrl_pts[i : i + 4]
+
+# M-matrix of a cubic Bezier curve, used to convert spline segments to Bezier form
+BEZIER_M = np.array([
+    [-1,  3, -3,  1],
+    [ 3, -6,  3,  0],
+    [-3,  3,  0,  0],
+    [ 1,  0,  0,  0]], dtype=float)
+
+def clamped_knots(num_ctrl_pts, degree):
+    """
+    Makes a clamped knot vector with evenly spaced interior knots, so the spline starts and ends at its end control points.
+
+    Arguments:
+        num_ctrl_pts: int, the number of control points
+        degree: int, the degree of the spline
+
+    Returns:
+        numpy array of num_ctrl_pts + degree + 1 knots from 0 to 1
+    """
+    return np.concatenate([
+        np.zeros(degree),
+        np.linspace(0, 1, num_ctrl_pts - degree + 1),
+        np.ones(degree)])
+
+def find_spans(knots, degree, us):
+    """
+    Finds the knot span containing each parameter value with a binary search.
+
+    Arguments:
+        knots: numpy array, the knot vector
+        degree: int, the degree of the spline
+        us: numpy array, the parameter values
+
+    Returns:
+        numpy array of ints, for each u the index s where knots[s] <= u < knots[s + 1],
+        clamped to the spans the spline is defined on
+    """
+    return np.clip(np.searchsorted(knots, us, side='right') - 1, degree, len(knots) - degree - 2)
+
+def de_boor(knots, degree, us, spans, pts):
+    """
+    Evaluates B-splines with De Boor's algorithm, vectorized over many parameter values.
+    See https://en.wikipedia.org/wiki/De_Boor%27s_algorithm
+
+    Arguments:
+        knots: numpy array, the knot vector
+        degree: int, the degree of the spline
+        us: (m,) numpy array, the parameter values
+        spans: (m,) numpy array, the knot span of each parameter value, see find_spans
+        pts: (m, degree + 1, k) numpy array, for each parameter value the control points spans - degree to spans
+
+    Returns:
+        (m, k) numpy array, the point on the spline at each parameter value
+    """
+    d = np.array(pts, dtype=float)
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[spans + j - degree]
+            denom = knots[spans + j + 1 - r] - left
+            # repeated knots give empty intervals, which don't contribute
+            alpha = np.where(denom > 0, (us - left) / np.where(denom > 0, denom, 1), 0)[:, np.newaxis]
+            d[:, j] = (1 - alpha) * d[:, j - 1] + alpha * d[:, j]
+    return d[:, degree]
+
+class NURBSSpline(Spline):
+    """
+    Implementation of a Non-Uniform Rational B-Spline of any degree.
+    Unlike the other splines, its knots don't have to be evenly spaced, so detail can be
+    concentrated where it's needed instead of adding control points everywhere.
+    """
+
+    def __init__(self, ani_time, *ctrl_pts, degree=3, knots=None, weights=None):
+        """
+        Creates a new NURBS.
+
+        Arguments:
+            ani_time: float, time in seconds to animate this spline for
+            ctrl_pts: list of QVector3D's, control points defining the shape of the spline
+            degree: int, the degree of the spline's polynomial segments
+            knots: list of len(ctrl_pts) + degree + 1 non-decreasing floats, the knot vector,
+                   defaults to clamped and evenly spaced
+            weights: list of positive floats, the weight of each control point, defaults to all 1
+        """
+        super().__init__(ani_time, *ctrl_pts)
+        num_ctrl_pts = len(ctrl_pts)
+        assert 1 <= degree < num_ctrl_pts
+        self.degree = degree
+        self.knots = clamped_knots(num_ctrl_pts, degree) if knots is None else np.array(knots, dtype=float)
+        assert len(self.knots) == num_ctrl_pts + degree + 1
+        assert np.all(np.diff(self.knots) >= 0)
+        self.weights = np.ones(num_ctrl_pts) if weights is None else np.array(weights, dtype=float)
+        assert len(self.weights) == num_ctrl_pts
+        assert np.all(self.weights > 0)
+
+        # control points in homogeneous coordinates, (w x, w y, w z, w)
+        self._pts = np.empty((num_ctrl_pts, 4))
+        self._pts[:, :3] = [(p.x(), p.y(), p.z()) for p in ctrl_pts]
+        self._pts[:, :3] *= self.weights[:, np.newaxis]
+        self._pts[:, 3] = self.weights
+        # the spline is defined between these knots
+        self._u_min = self.knots[degree]
+        self._u_max = self.knots[num_ctrl_pts]
+        # plain lists for fast scalar span lookups and evaluation
+        self._knot_list = self.knots.tolist()
+        self._pt_list = self._pts.tolist()
+        # scratch space for write_pos
+        self._work = [[0.0] * 4 for _ in range(degree + 1)]
+        self._span_offsets = np.arange(-degree, 1)
+
+    def pos_at(self, t):
+        """
+        Overrides Spline.pos_at
+        """
+        # clamp t and scale it to the knot range
+        u = util.lerp(min(max(t, 0), 1), 0, 1, self._u_min, self._u_max)
+        # binary search for the knot span
+        span = min(max(bisect.bisect_right(self._knot_list, u) - 1, self.degree), len(self.ctrl_pts) - 1)
+        x, y, z, w = de_boor(self.knots, self.degree, np.array([u]), np.array([span]), self._pts[np.newaxis, span - self.degree : span + 1])[0]
+        return QVector3D(x / w, y / w, z / w)
+
+    def write_pos(self, t, out):
+        """
+        Overrides Spline.write_pos
+        """
+        # same steps as pos_at, with De Boor's algorithm done on plain floats in preallocated lists
+        u = util.lerp(min(max(t, 0), 1), 0, 1, self._u_min, self._u_max)
+        p = self.degree
+        span = min(max(bisect.bisect_right(self._knot_list, u) - 1, p), len(self._pt_list) - 1)
+        knots = self._knot_list
+        d = self._work
+        for j in range(p + 1):
+            d[j][:] = self._pt_list[span - p + j]
+        for r in range(1, p + 1):
+            for j in range(p, r - 1, -1):
+                left = knots[span + j - p]
+                denom = knots[span + j + 1 - r] - left
+                # repeated knots give empty intervals, which don't contribute
+                alpha = (u - left) / denom if denom > 0 else 0.0
+                a = d[j - 1]
+                b = d[j]
+                b[0] = (1 - alpha) * a[0] + alpha * b[0]
+                b[1] = (1 - alpha) * a[1] + alpha * b[1]
+                b[2] = (1 - alpha) * a[2] + alpha * b[2]
+                b[3] = (1 - alpha) * a[3] + alpha * b[3]
+        x, y, z, w = d[p]
+        out[0] = x / w
+        out[1] = y / w
+        out[2] = z / w
+
+    def pos_at_many(self, ts):
+        """
+        Gets the position of the spline at many values of the interpolation parameter at once.
+
+        Arguments:
+            ts: numpy array of floats from 0 to 1, the interpolation parameters
+
+        Returns:
+            (len(ts), 3) numpy array of the positions
+        """
+        us = self._u_min + np.clip(np.asarray(ts, dtype=float), 0, 1) * (self._u_max - self._u_min)
+        spans = find_spans(self.knots, self.degree, us)
+        pts = de_boor(self.knots, self.degree, us, spans, self._pts[spans[:, np.newaxis] + self._span_offsets])
+        return pts[:, :3] / pts[:, 3:]
+
+    def _nonempty_spans(self):
+        """
+        Gets the index of each knot span with nonzero length, each of which is one segment of the spline.
+        """
+        spans = np.arange(self.degree, len(self.ctrl_pts))
+        return spans[self.knots[spans] < self.knots[spans + 1]]
+
+    @property
+    def num_segments(self):
+        """
+        Overrides Spline.num_segments
+        """
+        return len(self._nonempty_spans())
+
+    @property
+    def segment_params(self):
+        """
+        Overrides Spline.segment_params
+        """
+        spans = self._nonempty_spans()
+        u = np.stack([self.knots[spans], self.knots[spans + 1]], axis=1)
+        return (u - self._u_min) / (self._u_max - self._u_min)
+
+    def _segment_hulls(self):
+        """
+        Overrides Spline._segment_hulls
+        """
+        # with positive weights, each span lies inside the control points it depends on
+        pts = self._pts[:, :3] / self._pts[:, 3:]
+        return pts[self._nonempty_spans()[:, np.newaxis] + self._span_offsets]
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + repr(self.ani_time) + ''.join(', ' + repr(pt) for pt in self.ctrl_pts) + \
+            ', degree=' + repr(self.degree) + ', knots=' + repr(self._knot_list) + ', weights=' + repr(self.weights.tolist()) + ')'
+
+# names of the spline types as used in spline spec files
+SPLINE_TYPES = {
+    'catmull-rom': CatmullRomSpline,
+    'bspline': UniformBSpline,
+    'nurbs': NURBSSpline,
+}
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import socket
+import time
+
+from .streaming import FRAME, parse_address
+
+
+def connect(address):
+    """
+    Connects to a TransformPublisher.
+
+    Arguments:
+        address: str, either HOST:PORT for a TCP socket or a path for a Unix domain socket
+
+    Returns:
+        the connected socket
+    """
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+        # frames are small, don't hold them back waiting for more
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    return sock
+
+def read_frames(sock, delay=0.0):
+    """
+    Reads frame records from a connected socket until the publisher disconnects.
+
+    Arguments:
+        sock: socket, connected to a TransformPublisher
+        delay: float, seconds to sleep after each read, to simulate a slow consumer
+
+    Returns:
+        an iterator of (received, record) where:
+            received: float, time.monotonic() when the record was received
+            record: tuple, the unpacked FRAME record
+    """
+    buf = b''
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            return
+        received = time.monotonic()
+        buf += data
+        # records are fixed size, keep any partial record for the next read
+        num_records = len(buf) // FRAME.size
+        for record in FRAME.iter_unpack(buf[:num_records * FRAME.size]):
+            yield received, record
+        buf = buf[num_records * FRAME.size:]
+        if delay > 0:
+            time.sleep(delay)
+
+def measure(sock, duration=None, report_interval=1.0, delay=0.0):
+    """
+    Reads frames and prints latency and throughput statistics.
+
+    Arguments:
+        sock: socket, connected to a TransformPublisher
+        duration: float, the number of seconds to measure for, defaults to until the publisher disconnects
+        report_interval: float, the number of seconds between printed reports
+        delay: float, seconds to sleep after each read, to simulate a slow consumer
+    """
+    start = time.monotonic()
+    next_report = start + report_interval
+    total_frames = 0
+    missed_frames = 0
+    latencies = []
+    prev_frame = None
+
+    def report(now, latencies):
+        line = '{:8.2f} s: {:6d} frames, {:8.1f} frames/s, {:6d} missed'.format(
+            now - start, total_frames, total_frames / (now - start), missed_frames)
+        if latencies:
+            # latency since the last report
+            latencies = sorted(latencies)
+            line += ', latency mean {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms'.format(
+                1000 * sum(latencies) / len(latencies), 1000 * latencies[int(0.99 * (len(latencies) - 1))], 1000 * latencies[-1])
+        print(line)
+
+    for received, (frame, t, sent, x, y, z, s, qx, qy, qz) in read_frames(sock, delay):
+        total_frames += 1
+        latencies.append(received - sent)
+        # frames dropped by the publisher show up as gaps in the frame numbers
+        if prev_frame is not None and frame > prev_frame + 1:
+            missed_frames += frame - prev_frame - 1
+        prev_frame = frame
+
+        if received >= next_report:
+            report(received, latencies)
+            latencies = []
+            next_report += report_interval
+        if duration is not None and received - start >= duration:
+            break
+    report(time.monotonic(), latencies)
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='proj1.stream_client',
+        description='Subscribes to the transforms streamed by proj1 --stream and measures latency and throughput.')
+    parser.add_argument('address', help='HOST:PORT of a TCP socket or path of a Unix domain socket.')
+    parser.add_argument('--duration', type=float, help='Number of seconds to measure for (default: until the stream ends).')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds to sleep after each read, to simulate a slow consumer (default: %(default)s).')
+    args = parser.parse_args()
+
+    sock = connect(args.address)
+    measure(sock, args.duration, delay=args.delay)
+    sock.close()
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+
+import asyncio
+import collections
+import concurrent.futures
+import os
+import struct
+import threading
+import time
+
+
+# one record per frame: frame number, animation time, time.monotonic() when published,
+# position (x, y, z) and rotation quaternion (s, x, y, z)
+FRAME = struct.Struct('<Idd7f')
+
+
+def parse_address(address):
+    """
+    Parses a subscriber address.
+
+    Arguments:
+        address: str, either HOST:PORT for a TCP socket or a path for a Unix domain socket
+
+    Returns:
+        (host, port) for TCP, or the path for a Unix domain socket
+    """
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return host or '127.0.0.1', int(port)
+    return address
+
+class _Subscriber(object):
+    """
+    One connected subscriber and the frames waiting to be sent to it.
+    """
+
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        # oldest frames fall off the end once the queue is full
+        self.queue = collections.deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+        self.closed = False
+        # set once the subscriber has been served and disconnected
+        self.finished = asyncio.Event()
+
+    def push(self, record):
+        """
+        Queues a frame record to be sent, dropping the oldest one if the queue is full.
+        """
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+        self.queue.append(record)
+        self.ready.set()
+
+    def close(self):
+        """
+        Stops sending to the subscriber once any queued frames are sent.
+        """
+        self.closed = True
+        self.ready.set()
+
+    def abort(self):
+        """
+        Drops the connection straight away, without sending anything still queued or buffered.
+        Unblocks run even if it's waiting for a subscriber that stopped reading.
+        """
+        self.closed = True
+        self.writer.transport.abort()
+
+    async def run(self):
+        """
+        Sends queued frames until the subscriber disconnects, all frames queued since the last send in one batch.
+        """
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            if self.queue:
+                batch = b''.join(self.queue)
+                self.queue.clear()
+                self.writer.write(batch)
+            if self.closed:
+                return
+            # only this subscriber waits on a slow connection, new frames keep queueing meanwhile
+            await self.writer.drain()
+
+class TransformPublisher(object):
+    """
+    Streams per-frame transforms to any number of local subscribers as fixed-size FRAME records.
+    The server runs on its own asyncio event loop in a background thread, so publishing never blocks the animation.
+    """
+
+    def __init__(self, address, queue_size=256):
+        """
+        Starts a new publisher listening for subscribers.
+
+        Arguments:
+            address: str, either HOST:PORT for a TCP socket or a path for a Unix domain socket
+            queue_size: int, the most frames queued for each subscriber before the oldest are dropped
+        """
+        self.address = parse_address(address)
+        self.queue_size = queue_size
+        self.subscribers = set()
+        # frames dropped for subscribers that have disconnected, because they didn't keep up
+        self.dropped = 0
+
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.error = None
+        self.thread = threading.Thread(target=self._run, args=(started,), name='TransformPublisher', daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self, started):
+        """
+        Runs the event loop, in the background thread.
+        """
+        asyncio.set_event_loop(self.loop)
+        try:
+            if isinstance(self.address, tuple):
+                host, port = self.address
+                self.server = self.loop.run_until_complete(asyncio.start_server(self._handle, host, port))
+            else:
+                if os.path.exists(self.address):
+                    # remove socket left over from a previous run
+                    os.unlink(self.address)
+                self.server = self.loop.run_until_complete(asyncio.start_unix_server(self._handle, self.address))
+        except OSError as e:
+            self.error = e
+            started.set()
+            self.loop.close()
+            return
+        started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _handle(self, reader, writer):
+        """
+        Serves one subscriber until it disconnects.
+        """
+        subscriber = _Subscriber(writer, self.queue_size)
+        self.subscribers.add(subscriber)
+        try:
+            await subscriber.run()
+        except ConnectionError:
+            # subscriber went away
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+            self.dropped += subscriber.dropped
+            subscriber.finished.set()
+
+    def _dispatch(self, record):
+        """
+        Queues a frame record for every subscriber, in the event loop thread.
+        """
+        for subscriber in self.subscribers:
+            subscriber.push(record)
+
+    def publish(self, frame, t, x, y, z, s, qx, qy, qz):
+        """
+        Sends one frame to every subscriber. Safe to call from any thread, returns immediately.
+
+        Arguments:
+            frame: int, the frame number
+            t: float, the animation time in seconds
+            x, y, z: floats, the position of the object
+            s, qx, qy, qz: floats, the components of the object's rotation quaternion
+        """
+        record = FRAME.pack(frame, t, time.monotonic(), x, y, z, s, qx, qy, qz)
+        self.loop.call_soon_threadsafe(self._dispatch, record)
+
+    async def _shutdown(self, timeout):
+        """
+        Stops accepting subscribers and disconnects the current ones.
+
+        Arguments:
+            timeout: float, the most seconds to wait for each step of the shutdown
+        """
+        self.server.close()
+        subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+        try:
+            # let subscribers that are still reading receive the last frames
+            await asyncio.wait_for(asyncio.gather(*(subscriber.finished.wait() for subscriber in subscribers)), timeout)
+        except asyncio.TimeoutError:
+            # the rest stopped reading and would block forever
+            for subscriber in subscribers:
+                if not subscriber.finished.is_set():
+                    subscriber.abort()
+        try:
+            await asyncio.wait_for(asyncio.gather(*(subscriber.finished.wait() for subscriber in subscribers)), timeout)
+            await asyncio.wait_for(self.server.wait_closed(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self, timeout=1.0):
+        """
+        Shuts down the publisher and waits for its thread to finish.
+        Subscribers that don't take the last frames within the timeout are disconnected without them.
+
+        Arguments:
+            timeout: float, roughly the most seconds to take, if every subscriber stopped reading
+
+        Returns:
+            self.dropped, the total number of frames dropped for subscribers
+        """
+        if not self.thread.is_alive():
+            return self.dropped
+        shutdown = asyncio.run_coroutine_threadsafe(self._shutdown(timeout / 4), self.loop)
+        try:
+            shutdown.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # give up on shutting down cleanly
+            shutdown.cancel()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout)
+        if not isinstance(self.address, tuple) and os.path.exists(self.address):
+            os.unlink(self.address)
+        return self.dropped
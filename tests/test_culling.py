@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QVector3D, QMatrix4x4
+
+from proj1.culling import box_in_frustum
+from proj1.spline import CatmullRomSpline, UniformBSpline, NURBSSpline
+
+
+CTRL_PTS = [QVector3D(10 * np.cos(a), 10 * np.sin(a), a) for a in np.linspace(0, 4 * np.pi, 12)]
+
+SPLINES = [
+    CatmullRomSpline(10.0, *CTRL_PTS),
+    UniformBSpline(10.0, *CTRL_PTS),
+    NURBSSpline(10.0, *CTRL_PTS),
+    NURBSSpline(10.0, *CTRL_PTS, degree=2, knots=[0, 0, 0, 0.1, 0.1, 0.2, 0.4, 0.5, 0.6, 0.7, 0.9, 1, 1, 1, 1],
+        weights=np.linspace(0.5, 2, len(CTRL_PTS))),
+]
+
+@pytest.mark.parametrize('spline', SPLINES, ids=lambda spline: type(spline).__name__)
+def test_segments_contain_spline(spline):
+    out = [0.0] * 3
+    for (t0, t1), (box_min, box_max) in zip(spline.segment_params, spline.segment_bounds):
+        for t in np.linspace(t0, t1, 20, endpoint=False):
+            spline.write_pos(t, out)
+            assert np.all(box_min - 1e-6 <= out) and np.all(out <= box_max + 1e-6)
+
+def test_box_in_frustum_clip_space():
+    # with the identity, world coordinates are clip coordinates and the view is the cube from -1 to 1
+    identity = np.eye(4)
+    assert box_in_frustum([(-0.5, -0.5, -0.5), (0.5, 0.5, 0.5)], identity)
+    # partly inside
+    assert box_in_frustum([(0.5, 0.5, 0.5), (2, 2, 2)], identity)
+    # surrounds the whole view, every corner is outside but not all beyond the same plane
+    assert box_in_frustum([(-5, -5, -5), (5, 5, 5)], identity)
+    # entirely beyond one plane
+    for axis in range(3):
+        for sign in (-1, 1):
+            box = np.array([(-0.5, -0.5, -0.5), (0.5, 0.5, 0.5)])
+            box[:, axis] = sign * np.array([1.5, 3])
+            assert not box_in_frustum(box, identity)
+
+def test_box_in_frustum_perspective():
+    # the same matrix Qt3D's camera uses, looking down -z from the origin
+    projection = QMatrix4x4()
+    projection.perspective(90, 2, 1, 100)
+    M = np.array(projection.copyDataTo()).reshape(4, 4)
+    assert box_in_frustum([(-1, -1, -11), (1, 1, -9)], M)
+    # behind the camera
+    assert not box_in_frustum([(-1, -1, 9), (1, 1, 11)], M)
+    # past the far plane
+    assert not box_in_frustum([(-1, -1, -111), (1, 1, -109)], M)
+    # the wider aspect ratio brings the same box into view
+    box = [(12, -1, -11), (14, 1, -9)]
+    assert box_in_frustum(box, M)
+    projection = QMatrix4x4()
+    projection.perspective(90, 1, 1, 100)
+    assert not box_in_frustum(box, np.array(projection.copyDataTo()).reshape(4, 4))
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from proj1.easing import EASINGS, TimeWarp, parse_time_warp
+
+
+@pytest.mark.parametrize('name', sorted(set(EASINGS) - {'linear'}))
+def test_easings_keep_endpoints(name):
+    time_warp = parse_time_warp(name)
+    assert time_warp(0.0) == 0
+    assert time_warp(1.0) == 1
+    ts = np.linspace(0, 1, 101)
+    assert np.allclose(time_warp.evaluate(ts), [time_warp(t) for t in ts])
+
+def test_parse_values():
+    time_warp = parse_time_warp(' 0, 0.2, 0.7, 1')
+    assert time_warp.table.tolist() == [0, 0.2, 0.7, 1]
+    assert time_warp(0.5) == pytest.approx(0.45)
+    assert parse_time_warp('linear') is None
+
+@pytest.mark.parametrize('text', ['2, 3', '0, 0.5', '0.5, 1', '0, 0.7, 0.2, 1', '1', 'bounce', '0 0.5 1'])
+def test_parse_rejects_bad_curves(text):
+    with pytest.raises(ValueError):
+        parse_time_warp(text)
+
+def test_rejects_curve_not_ending_at_1():
+    with pytest.raises(ValueError):
+        TimeWarp(lambda t: t / 2)
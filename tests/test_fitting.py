@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from proj1.fitting import fit_spline, fit_nurbs
+from proj1.spline import CatmullRomSpline, UniformBSpline, NURBSSpline, read_spec, write_spec
+
+
+def helix(num_points):
+    t = np.linspace(0, 6 * np.pi, num_points)
+    return np.stack([10 * np.cos(t), 10 * np.sin(t), t], axis=1)
+
+def pos_errors(spline, points):
+    # distance from each point to the spline over the parameter range the animation renders,
+    # which stops short of t = 1 where pos_at jumps to the last control point
+    ts = np.linspace(0, 1, len(points))[:-1]
+    fitted = np.array([(p.x(), p.y(), p.z()) for p in map(spline.pos_at, ts)])
+    return np.linalg.norm(fitted - points[:-1], axis=1)
+
+@pytest.mark.parametrize('spline_type', [CatmullRomSpline, UniformBSpline])
+def test_fit_spline_error_matches_pos_at(tmpdir, spline_type):
+    points = helix(2000)
+    ctrl_pts, max_error, rms_error = fit_spline(points, 0.05, spline_type)
+    assert max_error <= 0.05
+
+    path = str(tmpdir.join('fit.txt'))
+    write_spec(path, 10.0, ctrl_pts, np.zeros_like(ctrl_pts), spline_type)
+    splines, rotations = read_spec(path)
+    # only the fitted type is animated
+    assert [type(spline) for spline in splines] == [spline_type]
+    assert len(rotations) == len(ctrl_pts)
+
+    errors = pos_errors(splines[0], points)
+    # the last sample is fitted at the end of the last segment, which the animation never reaches exactly
+    assert errors.max() <= max_error + 1e-4
+    # the same squared errors, minus the last one, over one fewer sample
+    n = len(points)
+    assert np.sqrt(np.mean(errors * errors)) <= rms_error * np.sqrt(n / (n - 1)) + 1e-4
+
+def test_fit_bspline_uses_few_ctrl_pts():
+    # a B-spline doesn't pass through its control points, so pinning t = 1 to the last one would take many more
+    ctrl_pts, max_error, _ = fit_spline(helix(5000), 0.05, UniformBSpline)
+    assert max_error <= 0.05
+    assert len(ctrl_pts) < 30
+
+def test_fit_nurbs_error_matches_pos_at(tmpdir):
+    points = helix(2000)
+    ctrl_pts, knots, max_error, rms_error = fit_nurbs(points, 0.05)
+    assert max_error <= 0.05
+
+    path = str(tmpdir.join('fit.txt'))
+    write_spec(path, 10.0, ctrl_pts, np.zeros_like(ctrl_pts), NURBSSpline, 3, knots)
+    splines, _ = read_spec(path)
+    assert [type(spline) for spline in splines] == [NURBSSpline]
+
+    errors = pos_errors(splines[0], points)
+    assert errors.max() == pytest.approx(max_error, abs=1e-4)
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+import os
+import math
+import random
+import tracemalloc
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QMatrix4x4, QVector3D
+
+import proj1
+from proj1.easing import parse_time_warp
+from proj1.instancing import INSTANCE_SIZE, pack_instance_matrices, TransformSink, SplineFollower, InstanceBuffer
+from proj1.quaternion import Quaternion
+from proj1.spline import CatmullRomSpline, UniformBSpline, NURBSSpline
+
+
+def random_transforms(count, seed=0):
+    rng = random.Random(seed)
+    positions = [(rng.uniform(-10, 10), rng.uniform(-10, 10), rng.uniform(-10, 10)) for _ in range(count)]
+    rotations = [Quaternion.from_euler_angles(*(rng.uniform(-math.pi, math.pi) for _ in range(3))) for _ in range(count)]
+    return positions, rotations
+
+def model_matrix(pos, rot, scale=1.0):
+    # the same transform built with Qt, in the column-major order OpenGL reads
+    m = QMatrix4x4()
+    m.translate(*pos)
+    m *= rot.mat4x4
+    m.scale(scale)
+    return np.array(m.data(), dtype=np.float32)
+
+def test_pack_instance_matrices_matches_qt():
+    positions, rotations = random_transforms(50)
+    scales = np.linspace(0.5, 2, 50)
+    packed = pack_instance_matrices(positions, [(q.s, q.x, q.y, q.z) for q in rotations], scales)
+    assert packed.shape == (50, INSTANCE_SIZE) and packed.dtype == np.float32
+    expected = np.array([model_matrix(*args) for args in zip(positions, rotations, scales)])
+    assert np.allclose(packed, expected, atol=1e-6)
+
+def test_pack_instance_matrices_in_place():
+    out = np.zeros((3, INSTANCE_SIZE), dtype=np.float32)
+    positions = [(1, 2, 3), (4, 5, 6), (7, 8, 9)]
+    assert pack_instance_matrices(positions, out=out) is out
+    expected = np.array([model_matrix(pos, Quaternion()) for pos in positions])
+    assert np.array_equal(out, expected)
+
+def test_transform_sink_matches_pack():
+    positions, rotations = random_transforms(20, seed=1)
+    out = np.zeros((20, INSTANCE_SIZE), dtype=np.float32)
+    sink = TransformSink(out)
+    # write out of order, each write only touches its own row
+    for i in reversed(range(20)):
+        q = rotations[i]
+        sink.write(i, *positions[i], q.s, q.x, q.y, q.z)
+    expected = np.array([model_matrix(pos, rot) for pos, rot in zip(positions, rotations)])
+    assert np.allclose(out, expected, atol=1e-6)
+    assert np.array_equal(out, pack_instance_matrices(positions, [(q.s, q.x, q.y, q.z) for q in rotations]))
+
+def test_instance_buffer_sync():
+    instance_buffer = InstanceBuffer(2)
+    data = instance_buffer.sync()
+    assert bytes(data) == instance_buffer.matrices.tobytes()
+    # the renderer keeps sharing what it was last given
+    uploaded = type(data)(data)
+    TransformSink(instance_buffer.matrices).write(1, 1, 2, 3, 1, 0, 0, 0)
+    assert instance_buffer.sync() is data
+    assert bytes(data) == instance_buffer.matrices.tobytes()
+    assert bytes(uploaded) != bytes(data)
+
+@pytest.mark.parametrize('spline_type', [CatmullRomSpline, UniformBSpline, NURBSSpline])
+def test_frame_update_does_not_allocate(spline_type):
+    # the per-frame work of Proj1Ani.update, minus the Qt3D upload
+    positions, rotations = random_transforms(300)
+    spline = spline_type(10.0, *(QVector3D(*pos) for pos in positions))
+    spline.time_warp = parse_time_warp('ease-in-out')
+    rotation_times = [i / (len(rotations) - 1) for i in range(len(rotations))]
+    instance_buffer = InstanceBuffer(1)
+    follower = SplineFollower(rotation_times, rotations, TransformSink(instance_buffer.matrices))
+
+    def run():
+        for frame in range(1001):
+            follower.update(spline, frame / 1000)
+            instance_buffer.sync()
+
+    # first run builds the cached coefficients
+    run()
+    # only look at allocations made by the frame update itself, not pytest or the snapshots
+    frame_code = [tracemalloc.Filter(True, os.path.join(os.path.dirname(proj1.__file__), '*')), tracemalloc.Filter(True, __file__)]
+    tracemalloc.start()
+    try:
+        # fill the reused lists and CPython's float free list with objects tracemalloc knows about
+        run()
+        before = tracemalloc.take_snapshot().filter_traces(frame_code)
+        run()
+        after = tracemalloc.take_snapshot().filter_traces(frame_code)
+        # only count what the frames themselves allocate
+        tracemalloc.clear_traces()
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # nothing outlives a frame, anything that did would grow by at least one object per frame,
+    # rather than the odd free list entry changing hands with the snapshots
+    assert sum(stat.size_diff for stat in after.compare_to(before, 'lineno')) < 1024
+    # and the few temporaries within one don't pile up
+    assert peak < 1024
+
+def test_spline_follower_writes_transform():
+    positions, rotations = random_transforms(10, seed=2)
+    spline = CatmullRomSpline(10.0, *(QVector3D(*pos) for pos in positions))
+    spline.time_warp = parse_time_warp('ease-in')
+    rotation_times = [i / (len(rotations) - 1) for i in range(len(rotations))]
+    out = np.zeros((2, INSTANCE_SIZE), dtype=np.float32)
+    follower = SplineFollower(rotation_times, rotations, TransformSink(out), 1)
+    follower.update(spline, 0.3)
+    warped_t = spline.time_warp(0.3)
+    p = spline.pos_at(warped_t)
+    q = Quaternion.slerp_keys(warped_t, rotation_times, rotations)
+    assert follower.pos == pytest.approx([p.x(), p.y(), p.z()], abs=1e-5)
+    assert follower.rot == pytest.approx([q.s, q.x, q.y, q.z], abs=1e-12)
+    assert not out[0].any()
+    assert np.allclose(out[1], model_matrix(follower.pos, q), atol=1e-5)
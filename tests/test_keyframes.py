@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+import math
+import random
+
+import numpy as np
+import pytest
+
+from proj1.keyframes import slerp_track, angular_distance, reduce_rotation_keys
+from proj1.quaternion import Quaternion
+
+
+def as_array(rotations):
+    return np.array([(q.s, q.x, q.y, q.z) for q in rotations])
+
+def smooth_track(times):
+    # a smoothly turning orientation sampled at each key, like the keys of a spec file
+    return [Quaternion.from_euler_angles(3 * t, math.sin(5 * t), 2 * t * t) for t in times]
+
+def random_track(count, seed=0):
+    rng = random.Random(seed)
+    return [Quaternion.from_euler_angles(*(rng.uniform(-math.pi, math.pi) for _ in range(3))) for _ in range(count)]
+
+def random_times(count, seed=0):
+    rng = random.Random(seed)
+    times = np.cumsum([rng.uniform(0.1, 2) for _ in range(count)])
+    return list((times - times[0]) / (times[-1] - times[0]))
+
+def dense_error(times, rotations, reduced_times, reduced_rotations, samples=5001):
+    ts = np.linspace(0, 1, samples)
+    original = slerp_track(ts, np.array(times), as_array(rotations))
+    reduced = slerp_track(ts, np.array(reduced_times), as_array(reduced_rotations))
+    return angular_distance(original, reduced)
+
+def test_slerp_track_matches_slerp_keys():
+    rotations = random_track(20)
+    # include an opposite sign key and a repeated key
+    rotations[5] = -rotations[5]
+    rotations[9] = rotations[8]
+    times = random_times(20)
+    ts = np.concatenate([times, np.linspace(0, 1, 501)])
+    track = slerp_track(ts, np.array(times), as_array(rotations))
+    expected = as_array([Quaternion.slerp_keys(t, times, rotations) for t in ts])
+    assert np.allclose(track, expected, atol=1e-9)
+
+@pytest.mark.parametrize('tolerance', [0.001, 0.01, 0.1])
+def test_reduced_track_within_tolerance(tolerance):
+    times = random_times(200, seed=1)
+    rotations = smooth_track(times)
+    reduced_times, reduced_rotations, max_error = reduce_rotation_keys(rotations, tolerance, times)
+    assert len(reduced_rotations) < len(rotations)
+    errors = dense_error(times, rotations, reduced_times, reduced_rotations)
+    assert max_error <= tolerance
+    # the error is measured at fewer points than here, so it can only be slightly underestimated
+    assert errors.max() <= tolerance * 1.01
+    assert errors.max() == pytest.approx(max_error, rel=0.01, abs=1e-9)
+
+def test_redundant_keys_are_removed():
+    # every other key lies exactly on the slerp between its neighbours
+    ends = [Quaternion.from_euler_angles(0, 0, 0), Quaternion.from_euler_angles(1, 0.5, 0), Quaternion.from_euler_angles(1, 2, 0.5)]
+    rotations = []
+    for q1, q2 in zip(ends, ends[1:]):
+        rotations += [q1, Quaternion.slerp(0.5, q1, q2)]
+    rotations.append(ends[-1])
+    reduced_times, reduced_rotations, max_error = reduce_rotation_keys(rotations, 1e-6)
+    assert reduced_times == [0, 0.5, 1]
+    assert reduced_rotations == ends
+    assert max_error == pytest.approx(0, abs=1e-7)
+
+def test_end_keys_are_kept():
+    rotations = [Quaternion.from_euler_angles(0.1, 0.2, 0.3)] * 10
+    times = random_times(10, seed=2)
+    reduced_times, reduced_rotations, max_error = reduce_rotation_keys(rotations, math.pi, times)
+    assert reduced_times == [times[0], times[-1]]
+    assert reduced_rotations == [rotations[0], rotations[-1]]
+    assert max_error == 0
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import math
+
+import numpy as np
+import pytest
+
+from proj1.quaternion import Quaternion
+
+
+ROTATIONS = [
+    Quaternion.from_euler_angles(0, 0, 0),
+    Quaternion.from_euler_angles(math.pi / 2, 0, 0),
+    Quaternion.from_euler_angles(math.pi / 2, 0, 0),
+    Quaternion.from_euler_angles(0, math.pi, 0.3),
+    # opposite sign of an almost equal rotation, slerps the short way
+    -Quaternion.from_euler_angles(0.1, math.pi, 0.3),
+    Quaternion.from_euler_angles(1, 2, 3),
+]
+TIMES = [0, 0.1, 0.3, 0.35, 0.8, 1]
+
+def test_write_slerp_keys_matches_slerp_keys():
+    out = [0.0] * 4
+    for t in np.concatenate([[-1, 2], TIMES, np.linspace(0, 1, 301)]):
+        expected = Quaternion.slerp_keys(t, TIMES, ROTATIONS)
+        Quaternion.write_slerp_keys(t, TIMES, ROTATIONS, out)
+        assert out == pytest.approx([expected.s, expected.x, expected.y, expected.z], abs=1e-12)
+
+def test_write_slerp_keys_equal_keys():
+    # built separately, their dot product rounds to just above 1
+    q1 = Quaternion.from_euler_angles(0.3, 0.2, 0.1)
+    q2 = Quaternion.from_euler_angles(0.3, 0.2, 0.1)
+    assert q1.dot(q2) > 1.0
+    out = [0.0] * 4
+    for t in np.linspace(0, 1, 11):
+        Quaternion.write_slerp_keys(t, [0, 1], [q1, q2], out)
+        assert out == pytest.approx([q1.s, q1.x, q1.y, q1.z], abs=1e-12)
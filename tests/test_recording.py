@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+
+from proj1.recording import HEADER, RECORD, TransformRecorder, TransformRecording
+
+
+DIGEST = bytes(range(16))
+
+def make_records(count):
+    # values that are exact in float32, so they read back unchanged
+    return [(float(i), -2.0 * i, 0.5 * i, 1.0, 0.0, 0.25, -0.5) for i in range(count)]
+
+def test_round_trip(tmpdir):
+    path = str(tmpdir.join('rec.bin'))
+    records = make_records(50)
+    with TransformRecorder(path, 60.0, DIGEST) as recorder:
+        for record in records:
+            recorder.write(*record)
+
+    with TransformRecording(path) as recording:
+        assert recording.frame_rate == 60.0
+        assert recording.digest == DIGEST
+        assert len(recording) == 50
+        for i, record in enumerate(records):
+            assert recording[i] == record
+        assert recording[-1] == records[-1]
+
+def test_unclosed_recording_reads_from_file_size(tmpdir):
+    path = str(tmpdir.join('rec.bin'))
+    records = make_records(10)
+    recorder = TransformRecorder(path, 30.0, DIGEST)
+    for record in records:
+        recorder.write(*record)
+    # as if the process died, the header still has no frame count
+    recorder.file.flush()
+    try:
+        with open(path, 'rb') as f:
+            assert HEADER.unpack(f.read(HEADER.size))[3] == 0
+        with TransformRecording(path) as recording:
+            assert len(recording) == 10
+            assert recording[9] == records[9]
+    finally:
+        recorder.file.close()
+
+def test_partial_record_is_ignored(tmpdir):
+    path = str(tmpdir.join('rec.bin'))
+    recorder = TransformRecorder(path, 30.0, DIGEST)
+    for record in make_records(3):
+        recorder.write(*record)
+    recorder.file.write(RECORD.pack(*make_records(4)[3])[:10])
+    recorder.file.close()
+    with TransformRecording(path) as recording:
+        assert len(recording) == 3
+
+def test_out_of_range_frames(tmpdir):
+    path = str(tmpdir.join('rec.bin'))
+    with TransformRecorder(path, 60.0, DIGEST) as recorder:
+        for record in make_records(5):
+            recorder.write(*record)
+    with TransformRecording(path) as recording:
+        for frame in (5, 100, -6):
+            with pytest.raises(IndexError):
+                recording[frame]
+
+def test_bounds(tmpdir):
+    path = str(tmpdir.join('rec.bin'))
+    rng = np.random.RandomState(0)
+    positions = rng.uniform(-100, 100, (200, 3)).astype(np.float32)
+    with TransformRecorder(path, 60.0, DIGEST) as recorder:
+        for x, y, z in positions.tolist():
+            recorder.write(x, y, z, 1, 0, 0, 0)
+    recording = TransformRecording(path)
+    box_min, box_max = recording.bounds()
+    assert np.array_equal(box_min, positions.min(axis=0))
+    assert np.array_equal(box_max, positions.max(axis=0))
+    # no view of the map is left behind
+    recording.close()
+
+def test_not_a_recording(tmpdir):
+    path = tmpdir.join('spec.txt')
+    path.write('1\n' * 40)
+    with pytest.raises(ValueError):
+        TransformRecording(str(path))
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pytest
+from PyQt5.QtGui import QVector3D
+
+from proj1.spline import CatmullRomSpline, UniformBSpline, NURBSSpline
+
+
+CTRL_PTS = [QVector3D(10 * np.cos(a), 10 * np.sin(a), a) for a in np.linspace(0, 4 * np.pi, 12)]
+
+SPLINES = [
+    CatmullRomSpline(10.0, *CTRL_PTS),
+    UniformBSpline(10.0, *CTRL_PTS),
+    NURBSSpline(10.0, *CTRL_PTS),
+    NURBSSpline(10.0, *CTRL_PTS, degree=2, knots=[0, 0, 0, 0.1, 0.1, 0.2, 0.4, 0.5, 0.6, 0.7, 0.9, 1, 1, 1, 1],
+        weights=np.linspace(0.5, 2, len(CTRL_PTS))),
+]
+
+@pytest.mark.parametrize('spline', SPLINES, ids=lambda spline: type(spline).__name__)
+def test_write_pos_matches_pos_at(spline):
+    out = [0.0] * 3
+    # includes out of range values and the exact ends, where pos_at returns the end control points
+    for t in np.concatenate([[-0.5, 0, 1, 1.5, 1 - 1e-16], np.linspace(0, 1, 501)]):
+        expected = spline.pos_at(t)
+        spline.write_pos(t, out)
+        assert out == pytest.approx([expected.x(), expected.y(), expected.z()], abs=1e-4)
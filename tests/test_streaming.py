@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+
+from proj1.streaming import TransformPublisher
+from proj1.stream_client import connect, read_frames
+
+
+def wait_for_subscribers(publisher, count):
+    deadline = time.monotonic() + 5
+    while len(publisher.subscribers) < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+def test_subscriber_receives_every_frame(tmpdir):
+    address = str(tmpdir.join('stream.sock'))
+    publisher = TransformPublisher(address, queue_size=1000)
+    sock = connect(address)
+    wait_for_subscribers(publisher, 1)
+    for frame in range(100):
+        publisher.publish(frame, frame / 60, 1, 2, 3, 1, 0, 0, 0)
+    assert publisher.close() == 0
+    frames = [record[0] for _, record in read_frames(sock)]
+    sock.close()
+    assert frames == list(range(100))
+    assert not os.path.exists(address)
+
+def test_close_does_not_hang_on_stalled_subscriber(tmpdir):
+    address = str(tmpdir.join('stream.sock'))
+    publisher = TransformPublisher(address, queue_size=16)
+    # connects but never reads
+    sock = connect(address)
+    wait_for_subscribers(publisher, 1)
+    # far more than the socket and transport buffers hold
+    for frame in range(100000):
+        publisher.publish(frame, frame / 60, 1, 2, 3, 1, 0, 0, 0)
+        if frame % 1000 == 0:
+            time.sleep(0.001)
+
+    start = time.monotonic()
+    dropped = publisher.close(timeout=1.0)
+    assert time.monotonic() - start < 2.0
+    assert not publisher.thread.is_alive()
+    sock.close()
+    # frames that couldn't be sent are counted
+    assert dropped == publisher.dropped > 0